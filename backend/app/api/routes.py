@@ -1,24 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
 import os
+import json
 import uuid
-import sys
-
-# 获取当前文件的目录 (backend/app/api)
-current_dir = os.path.dirname(__file__)
-# 1. 添加 backend 目录到路径 (用于 import contract_ai.coordinator)
-sys.path.append(os.path.join(current_dir, "../../"))
-# 2. 【关键修复】添加 contract_ai 目录到路径 (用于解决 coordinator.py 内部的 "from base_agent import ..." 报错)
-sys.path.append(os.path.join(current_dir, "../../contract_ai"))
+import asyncio
 
 from contract_ai.coordinator import ContractCoordinator
 from app.services.pdf_service import PDFService
 
 router = APIRouter()
 
-# 初始化协调器 (单例模式)
-# 注意：确保环境变量 DEEPSEEK_API_KEY 已设置
-coordinator = ContractCoordinator()
+def get_coordinator(request: Request) -> ContractCoordinator:
+    """获取应用启动时创建的协调器 (见 app.main.lifespan)"""
+    return request.app.state.coordinator
 
 # --- 请求模型 ---
 class ReviewRequest(BaseModel):
@@ -28,48 +24,47 @@ class ReviewRequest(BaseModel):
 # --- 接口实现 ---
 
 @router.post("/pdf/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(request: Request, file: UploadFile = File(...)):
     """
     对应 coordinator.py 中 parse_pdf_through_api 调用的接口
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # 生成唯一文件名防止冲突
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(upload_dir, f"{file_id}_{file.filename}")
+    # 生成唯一文件名防止冲突；磁盘路径不使用客户端提供的文件名
+    file_id = uuid.uuid4().hex
+    file_path = request.app.state.upload_dir / f"{file_id}.pdf"
     
     try:
         # 1. 保存文件
-        PDFService.save_upload_file(file, file_path)
+        await PDFService.save_upload_file(file, file_path)
         
-        # 2. 解析内容
-        content = PDFService.extract_text_from_pdf(file_path)
+        # 2. 解析内容 (阻塞调用，放到 PDF 专用线程池执行避免卡住事件循环)
+        content = await asyncio.get_running_loop().run_in_executor(
+            request.app.state.pdf_executor, PDFService.extract_text_from_pdf, str(file_path)
+        )
         
         return {
             "success": True,
             "message": "Upload and parse successful",
             "file_id": file_id,
+            "filename": os.path.basename(file.filename),
             "file_content": content # 返回解析后的文本给 Coordinator
         }
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 @router.post("/review")
-async def start_review(request: ReviewRequest):
+async def start_review(request: ReviewRequest, coordinator: ContractCoordinator = Depends(get_coordinator)):
     """
     触发智能体工作流
     """
     try:
         # 构造 LangChain 的 HumanMessage
-        from langchain_core.messages import HumanMessage
         msg = HumanMessage(content=request.contract_text)
         
-        # 你的 coordinator.py 中 process_text_message 是同步方法，但内部调用了 graph.invoke
-        response = coordinator.process_text_message(msg)
+        # 使用异步入口，审查期间不阻塞 uvicorn 事件循环
+        response = await coordinator.aprocess_text_message(msg)
         
         return {
             "status": "success",
@@ -78,6 +73,25 @@ async def start_review(request: ReviewRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Review process failed: {str(e)}")
 
+@router.post("/review/stream")
+async def stream_review(request: ReviewRequest, coordinator: ContractCoordinator = Depends(get_coordinator)):
+    """
+    流式审查：以 SSE 格式推送智能体工作流各阶段（文档处理、并行分析、整合）完成后的结果
+    """
+    async def event_stream():
+        try:
+            msg = HumanMessage(content=request.contract_text)
+            async for event in coordinator.astream_text_message(msg):
+                yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'error': f'Review stream failed: {str(e)}'}, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @router.get("/health")
-def health_check():
-    return {"status": "active", "agents": list(coordinator.agents.keys())}
\ No newline at end of file
+def health_check(coordinator: ContractCoordinator = Depends(get_coordinator)):
+    """健康检查：智能体在首次审查时才创建，可用性按是否能创建判断"""
+    agents = coordinator.agent_status()
+    ready = all(status["available"] for status in agents.values())
+    return {"status": "active" if ready else "degraded", "agents": agents}
\ No newline at end of file
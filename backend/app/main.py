@@ -1,4 +1,8 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -7,11 +11,31 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.api.routes import router as api_router
+from app.services.pdf_service import warm_up_process_pool, shutdown_process_pool
+from contract_ai.coordinator import ContractCoordinator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # PDF 解析使用独立线程池，不与 asyncio.to_thread 的默认线程池（智能体调用等）争抢线程
+    app.state.pdf_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="pdf-parse")
+    # 上传目录只在启动时创建一次，请求中不再重复检查
+    upload_dir = Path("uploads").resolve()
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    app.state.upload_dir = upload_dir
+    # 每个进程只初始化一次协调器，在线程中构造避免阻塞事件循环
+    # 注意：确保环境变量 DEEPSEEK_API_KEY 已设置
+    app.state.coordinator = await asyncio.to_thread(ContractCoordinator)
+    # PDF 解析进程池提前预热
+    await asyncio.to_thread(warm_up_process_pool)
+    yield
+    shutdown_process_pool()
+    app.state.pdf_executor.shutdown(wait=False)
 
 app = FastAPI(
     title="Contract AI Backend",
     description="基于 LangGraph 多智能体系统的合同审查 API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 1. 配置 CORS
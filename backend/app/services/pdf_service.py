@@ -1,47 +1,166 @@
+import io
 import os
-import shutil
 import logging
+import multiprocessing
+import threading
+import aiofiles
 import pdfplumber
+import pypdfium2 as pdfium
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 from fastapi import UploadFile
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 上传文件分块写盘大小 (1MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# 页数达到该阈值才按页分片并行解析，短文档由单个 worker 进程一次解析完
+PARALLEL_PAGE_THRESHOLD = 8
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# 进程池在线程池、日志线程启动之后才创建，fork 会把其他线程持有的锁一起复制到子进程；
+# 使用 forkserver（不支持时用 spawn）从干净的进程启动 worker
+_MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 注意：PDFium 不是线程安全的，即使每个线程各自打开文档也不能并发调用，
+# pdfplumber 为纯 Python 实现会持有 GIL，因此所有解析（包括读取页数）都在进程池中执行
+def _get_process_pool() -> ProcessPoolExecutor:
+    """延迟创建进程池（整个进程共享）"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context(_MP_START_METHOD)
+            )
+        return _process_pool
+
+def _noop() -> None:
+    """进程池预热任务"""
+
+def warm_up_process_pool() -> None:
+    """启动时预先拉起全部 worker 进程，避免首个大文件承担进程创建开销"""
+    pool = _get_process_pool()
+    for future in [pool.submit(_noop) for _ in range(os.cpu_count() or 1)]:
+        future.result()
+
+def shutdown_process_pool() -> None:
+    """关闭进程池（应用退出时调用）"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def _read_pages_pdfium(pdf: "pdfium.PdfDocument", page_indices: List[int]) -> List[Optional[str]]:
+    """从已打开的文档中提取指定页 (从0开始计数) 的纯文本"""
+    texts = []
+    for i in page_indices:
+        page = pdf[i]
+        textpage = page.get_textpage()
+        try:
+            texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+        finally:
+            textpage.close()
+            page.close()
+    return texts
+
+def _extract_pages_pdfium(file_path: str, page_indices: List[int]) -> List[Optional[str]]:
+    """进程池 worker：使用 PDFium 提取指定页 (从0开始计数) 的纯文本"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return _read_pages_pdfium(pdf, page_indices)
+    finally:
+        pdf.close()
+
+def _probe_pdf(file_path: str) -> Tuple[int, Optional[List[Optional[str]]]]:
+    """进程池 worker：读取页数，短文档顺带提取全部页 (返回 (页数, 各页文本或None))"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page_count = len(pdf)
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            return page_count, _read_pages_pdfium(pdf, list(range(page_count)))
+        return page_count, None
+    finally:
+        pdf.close()
+
+def _extract_pages_pdfplumber(file_path: str, page_indices: List[int]) -> List[Optional[str]]:
+    """进程池 worker：pdfplumber 后备方案，只打开指定页 (从0开始计数)"""
+    with pdfplumber.open(file_path, pages=[i + 1 for i in page_indices]) as pdf:
+        return [page.extract_text() for page in pdf.pages]
+
 class PDFService:
     @staticmethod
-    def save_upload_file(upload_file: UploadFile, destination: str):
+    async def save_upload_file(upload_file: UploadFile, destination: Union[str, Path]):
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(destination), exist_ok=True)
-            
-            # 保存文件
-            with open(destination, "wb") as buffer:
-                shutil.copyfileobj(upload_file.file, buffer)
+            # 上传目录已在应用启动时创建 (见 app.main.lifespan)
+            # 分块异步写盘，避免阻塞事件循环和整文件缓冲
+            async with aiofiles.open(destination, "wb") as out:
+                while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                    await out.write(chunk)
             logger.info(f"文件已保存: {destination}")
         except Exception as e:
             logger.error(f"保存文件失败: {e}")
             raise Exception(f"保存文件失败: {str(e)}")
         finally:
-            upload_file.file.close()
+            await upload_file.close()
+
+    @staticmethod
+    def _extract_pages_parallel(worker, file_path: str, page_count: int) -> List[Optional[str]]:
+        """按页码区间分片，多进程并行提取，结果按页序拼接"""
+        workers = min(os.cpu_count() or 1, page_count)
+        step = -(-page_count // workers)  # 向上取整
+        shards = [
+            list(range(start, min(start + step, page_count)))
+            for start in range(0, page_count, step)
+        ]
+        pool = _get_process_pool()
+        futures = [pool.submit(worker, file_path, shard) for shard in shards]
+        
+        page_texts = []
+        for future in futures:
+            page_texts.extend(future.result())
+        return page_texts
+
+    @staticmethod
+    def _extract_page_texts(worker, file_path: str, page_count: int) -> List[Optional[str]]:
+        """短文档交给单个 worker 进程解析，长文档按页分片并行"""
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            return _get_process_pool().submit(worker, file_path, list(range(page_count))).result()
+        return PDFService._extract_pages_parallel(worker, file_path, page_count)
 
     @staticmethod
     def extract_text_from_pdf(file_path: str) -> str:
-        text_content = []
+        buf = io.StringIO()
         try:
-            with pdfplumber.open(file_path) as pdf:
-                if not pdf.pages:
-                    return "警告：PDF文件为空"
-                
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        text_content.append(text)
-                    else:
-                        # 处理扫描件或纯图片PDF的情况
-                        logger.warning(f"第 {i+1} 页无法提取文本（可能是图片/扫描件）")
+            # 页数与短文档的文本在同一个 worker 进程中一次取回
+            page_count, page_texts = _get_process_pool().submit(_probe_pdf, file_path).result()
+            if not page_count:
+                return "警告：PDF文件为空"
+            
+            # 纯文本提取优先使用 PDFium，结果为空时再用 pdfplumber 兜底
+            if page_texts is None:
+                page_texts = PDFService._extract_pages_parallel(_extract_pages_pdfium, file_path, page_count)
+            if not any(text and text.strip() for text in page_texts):
+                logger.info("PDFium 未提取到文本，改用 pdfplumber 解析")
+                page_texts = PDFService._extract_page_texts(_extract_pages_pdfplumber, file_path, page_count)
+            
+            # 逐页写入缓冲区，页与页之间以换行分隔
+            for i, text in enumerate(page_texts):
+                if text:
+                    if buf.tell():
+                        buf.write("\n")
+                    buf.write(text)
+                else:
+                    # 处理扫描件或纯图片PDF的情况
+                    logger.warning(f"第 {i+1} 页无法提取文本（可能是图片/扫描件）")
             
-            full_text = "\n".join(text_content)
+            full_text = buf.getvalue()
             
             if not full_text.strip():
                 return "解析结果为空：该PDF可能是纯图片扫描件，当前版本仅支持提取可编辑文本。"
@@ -2,23 +2,59 @@
 优化后的基础智能体类
 Optimized Base Agent with Caching, Performance Monitoring and Retry Logic
 """
+import re
 import json
+import asyncio
 import logging
 import time
 import hashlib
-from typing import Dict, Any, Optional, List
-from functools import lru_cache, wraps
-from datetime import datetime, timedelta
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from itertools import accumulate
+from typing import Dict, Any, Optional, List, Tuple, Protocol, AsyncIterator
+from functools import cache, wraps
+from datetime import datetime
 from langchain_core.runnables import Runnable
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_deepseek import ChatDeepSeek
-from config import Config
+from contract_ai.config import Config
+
+# 缓存键只用于查找，不需要加密强度：优先使用 xxh3，未安装时回退到 blake2b
+try:
+    import xxhash
+
+    def _new_key_hasher():
+        return xxhash.xxh3_128()
+except ImportError:
+    def _new_key_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class CacheBackend(Protocol):
+    """缓存后端接口"""
+    # 读写是否涉及网络等阻塞操作（为 True 时异步路径放到线程中调用）
+    blocking: bool
+    def get(self, key: str) -> Optional[Any]: ...
+    def set(self, key: str, value: Any): ...
+    def clear(self): ...
+    def stats(self) -> Dict[str, Any]: ...
+
+# 文本压缩时用于筛选中间重要句子的关键词，编译为单个正则一次扫描全文
+IMPORTANT_KEYWORDS = ['风险', '违约', '责任', '义务', '权利', '付款', '价格', '标准', '要求']
+_IMPORTANT_KEYWORDS_RE = re.compile('|'.join(map(re.escape, IMPORTANT_KEYWORDS)))
 
 # 简单的内存缓存实现
 class SimpleCache:
-    """简单的内存缓存类"""
+    """简单的内存缓存类（LRU + TTL）"""
+    blocking = False
+    
     def __init__(self, ttl: int = 3600, max_size: int = 100):
-        self.cache: Dict[str, tuple] = {}  # key -> (value, expire_time)
+        # key -> (value, expire_time)，按访问顺序排列，队首为最久未使用
+        self.cache: OrderedDict = OrderedDict()
         self.ttl = ttl
         self.max_size = max_size
         self.hits = 0
@@ -26,9 +62,11 @@ class SimpleCache:
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
-        if key in self.cache:
-            value, expire_time = self.cache[key]
-            if datetime.now() < expire_time:
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, expire_time = entry
+            if time.monotonic() < expire_time:
+                self.cache.move_to_end(key)
                 self.hits += 1
                 return value
             else:
@@ -38,14 +76,13 @@ class SimpleCache:
     
     def set(self, key: str, value: Any):
         """设置缓存"""
-        # LRU淘汰
-        if len(self.cache) >= self.max_size:
-            # 删除最早过期的项
-            oldest_key = min(self.cache.items(), key=lambda x: x[1][1])[0]
-            del self.cache[oldest_key]
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            # LRU淘汰：删除最久未使用的项
+            self.cache.popitem(last=False)
         
-        expire_time = datetime.now() + timedelta(seconds=self.ttl)
-        self.cache[key] = (value, expire_time)
+        self.cache[key] = (value, time.monotonic() + self.ttl)
     
     def clear(self):
         """清空缓存"""
@@ -64,29 +101,282 @@ class SimpleCache:
             "size": len(self.cache)
         }
 
+class RedisCache:
+    """Redis 共享缓存，多 worker 进程共用同一份缓存"""
+    blocking = True
+    
+    def __init__(self, url: str, ttl: int = 3600, key_prefix: str = "contractai:llm:"):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+        self._logger = logging.getLogger(__name__)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存（Redis 不可用时按未命中处理）"""
+        try:
+            raw = self.client.get(self.key_prefix + key)
+        except Exception as e:
+            self._logger.warning(f"⚠️ Redis 读取失败: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+    
+    def set(self, key: str, value: Any):
+        """设置缓存（SET key value EX ttl）"""
+        try:
+            self.client.set(
+                self.key_prefix + key,
+                json.dumps(value, ensure_ascii=False),
+                ex=self.ttl
+            )
+        except Exception as e:
+            self._logger.warning(f"⚠️ Redis 写入失败: {e}")
+    
+    def clear(self):
+        """清空当前前缀下的缓存"""
+        try:
+            keys = list(self.client.scan_iter(match=self.key_prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            self._logger.warning(f"⚠️ Redis 清空失败: {e}")
+        self.hits = 0
+        self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计（命中数为当前进程视角）"""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total > 0 else 0
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": hit_rate
+        }
+
+def create_cache(cache_config) -> Optional[CacheBackend]:
+    """根据配置创建缓存后端"""
+    if not cache_config.enabled:
+        return None
+    if cache_config.backend == "redis":
+        return RedisCache(
+            url=cache_config.redis_url,
+            ttl=cache_config.ttl,
+            key_prefix=cache_config.key_prefix
+        )
+    return SimpleCache(
+        ttl=cache_config.ttl,
+        max_size=cache_config.max_size
+    )
+
+@cache
+def _load_embedding_model(model_name: str):
+    """加载向量模型（同名模型在进程内只加载一次，多个语义缓存共用）"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+class SemanticCache:
+    """语义缓存：按向量余弦相似度匹配表述不同但语义相同的请求"""
+    def __init__(self, model_name: str, threshold: float = 0.92, max_size: int = 1000):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_size = max_size
+        self._embeddings = None  # (N, d) 归一化向量矩阵
+        self._responses: List[Any] = []
+        # 查找与写入可能来自多个工作线程，向量矩阵和结果列表必须一起更新
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def fits(self, text: str) -> bool:
+        """文本是否完整落在模型的输入窗口内（超出部分会被截断，截断后的向量不能区分不同文本）"""
+        model = _load_embedding_model(self.model_name)
+        tokenizer = model.tokenizer
+        return len(tokenizer.tokenize(text)) + tokenizer.num_special_tokens_to_add() <= model.max_seq_length
+    
+    def embed(self, text: str):
+        """计算归一化向量（模型首次使用时加载）"""
+        return _load_embedding_model(self.model_name).encode(text, normalize_embeddings=True).astype(np.float32)
+    
+    def lookup(self, text: str) -> Tuple[Optional[Any], Any]:
+        """查找最相似的已缓存请求，返回 (命中结果或None, 查询向量)"""
+        query = self.embed(text)
+        with self._lock:
+            if self._embeddings is not None:
+                scores = self._embeddings @ query
+                idx = int(scores.argmax())
+                if scores[idx] >= self.threshold:
+                    self.hits += 1
+                    return self._responses[idx], query
+            self.misses += 1
+        return None, query
+    
+    def add(self, query, value: Any):
+        """写入缓存，超出容量时淘汰最早的条目"""
+        row = query[np.newaxis, :]
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = row
+            else:
+                if len(self._responses) >= self.max_size:
+                    self._embeddings = self._embeddings[1:]
+                    self._responses.pop(0)
+                self._embeddings = np.vstack([self._embeddings, row])
+            self._responses.append(value)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._embeddings = None
+            self._responses = []
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total > 0 else 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": hit_rate,
+            "size": len(self._responses)
+        }
+
+class LLMConcurrencyLimiter:
+    """进程内所有LLM请求共用的并发上限
+    
+    工作线程中的同步调用与各事件循环中的异步调用占用同一组名额，释放时按先来先到转交给下一个等待者
+    """
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._available = limit
+        # 等待者：threading.Event（同步调用）或 (事件循环, Future)（异步调用）
+        self._waiters: deque = deque()
+    
+    def acquire(self):
+        """阻塞当前线程直到获得名额"""
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+    
+    async def acquire_async(self):
+        """在事件循环中等待名额（不占用线程）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    queued = True
+                except ValueError:
+                    queued = False
+            # 名额已转交给本协程后才被取消时归还（尚未转交的由 _hand_over 归还）
+            if not queued and future.done() and not future.cancelled():
+                self.release()
+            raise
+    
+    def release(self):
+        """归还名额，有等待者时直接转交"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+                except RuntimeError:
+                    # 等待者所在的事件循环已关闭
+                    continue
+            self._available += 1
+    
+    def _hand_over(self, future: "asyncio.Future"):
+        """在等待者的事件循环中交出名额，等待已取消时继续转交"""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+    
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+# 所有智能体共用的LLM并发上限（避免触发服务端429限流）
+LLM_LIMITER = LLMConcurrencyLimiter(Config.PERFORMANCE_CONFIG.max_llm_concurrency)
+
+# 每个智能体保留的最近性能记录条数
+PERFORMANCE_HISTORY_SIZE = 1024
+
+def _record_performance(self, func_name: str, elapsed_ns: int):
+    """记录一次调用的性能指标（只存整数，格式化推迟到 get_performance_stats）"""
+    self.logger.info("⏱️ %s 执行时间: %.2f秒", func_name, elapsed_ns / 1e9)
+    
+    if not hasattr(self, '_performance_metrics'):
+        self._performance_metrics = deque(maxlen=PERFORMANCE_HISTORY_SIZE)
+    self._performance_metrics.append((func_name, elapsed_ns, time.time_ns()))
+
 def performance_monitor(func):
-    """性能监控装饰器"""
+    """性能监控装饰器（支持同步和异步函数）"""
+    # 关闭性能日志时不做任何包装，生产环境零开销
+    if not Config.LOGGING_CONFIG.enable_performance_log:
+        return func
+    
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            try:
+                result = await func(self, *args, **kwargs)
+                _record_performance(self, func.__name__, time.perf_counter_ns() - start_ns)
+                return result
+            except Exception as e:
+                elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+                self.logger.error(
+                    f"❌ {func.__name__} 执行失败 (耗时: {elapsed:.2f}秒): {str(e)}"
+                )
+                raise
+        return async_wrapper
+    
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         try:
             result = func(self, *args, **kwargs)
-            elapsed = time.time() - start_time
-            
-            self.logger.info(f"⏱️ {func.__name__} 执行时间: {elapsed:.2f}秒")
-            
-            # 记录性能指标
-            if not hasattr(self, '_performance_metrics'):
-                self._performance_metrics = []
-            self._performance_metrics.append({
-                "function": func.__name__,
-                "elapsed": elapsed,
-                "timestamp": datetime.now().isoformat()
-            })
-            
+            _record_performance(self, func.__name__, time.perf_counter_ns() - start_ns)
             return result
         except Exception as e:
-            elapsed = time.time() - start_time
+            elapsed = (time.perf_counter_ns() - start_ns) / 1e9
             self.logger.error(
                 f"❌ {func.__name__} 执行失败 (耗时: {elapsed:.2f}秒): {str(e)}"
             )
@@ -94,8 +384,29 @@ def performance_monitor(func):
     return wrapper
 
 def retry_on_error(max_retries: int = 3, delay: float = 1.0):
-    """错误重试装饰器"""
+    """错误重试装饰器（异步函数使用 asyncio.sleep 退避，不阻塞事件循环）"""
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                last_exception = None
+                for attempt in range(max_retries):
+                    try:
+                        return await func(self, *args, **kwargs)
+                    except Exception as e:
+                        last_exception = e
+                        if attempt < max_retries - 1:
+                            self.logger.warning(
+                                f"⚠️ {func.__name__} 第 {attempt + 1} 次尝试失败: {str(e)}，{delay * 2 ** attempt}秒后重试"
+                            )
+                            await asyncio.sleep(delay * 2 ** attempt)  # 指数退避
+                        else:
+                            self.logger.error(
+                                f"❌ {func.__name__} 所有重试均失败: {str(e)}"
+                            )
+                raise last_exception
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(self, *args, **kwargs):
             last_exception = None
@@ -106,9 +417,9 @@ def retry_on_error(max_retries: int = 3, delay: float = 1.0):
                     last_exception = e
                     if attempt < max_retries - 1:
                         self.logger.warning(
-                            f"⚠️ {func.__name__} 第 {attempt + 1} 次尝试失败: {str(e)}，{delay}秒后重试"
+                            f"⚠️ {func.__name__} 第 {attempt + 1} 次尝试失败: {str(e)}，{delay * 2 ** attempt}秒后重试"
                         )
-                        time.sleep(delay * (attempt + 1))  # 指数退避
+                        time.sleep(delay * 2 ** attempt)  # 指数退避
                     else:
                         self.logger.error(
                             f"❌ {func.__name__} 所有重试均失败: {str(e)}"
@@ -117,46 +428,95 @@ def retry_on_error(max_retries: int = 3, delay: float = 1.0):
         return wrapper
     return decorator
 
+# 连续空白字符
+_WS_RE = re.compile(r"\s+")
+
+# 行首的「任务：」/「上下文：」标记
+_TASK_LINE_RE = re.compile(r"^(任务|上下文)：(.*)", re.MULTILINE)
+
+# 对话角色到消息类的映射
+_ROLE_MESSAGE_CLASSES = {"user": HumanMessage, "assistant": AIMessage}
+
+# 每个智能体缓存的已转换对话历史条数
+HISTORY_CACHE_SIZE = 32
+
 class BaseAgent(Runnable):
     """优化后的基础智能体类"""
     
     def __init__(self, agent_name: str, system_prompt: str):
         self.agent_name = agent_name
         self.system_prompt = system_prompt
+        # 系统提示词不可变，只构造一次消息对象
+        self._system_msg = SystemMessage(content=system_prompt)
+        self._history_cache: "OrderedDict[tuple, List[Any]]" = OrderedDict()
         self.llm_config = Config.LLM_CONFIG
         self.cache_config = Config.CACHE_CONFIG
         self.performance_config = Config.PERFORMANCE_CONFIG
         self.processing_config = Config.PROCESSING_CONFIG
+        self._llm_signature = self._build_llm_signature()
         
         # 设置日志
         self.logger = logging.getLogger(agent_name)
         
-        # 初始化LLM
-        self.llm = ChatDeepSeek(
-            api_key=self.llm_config.api_key,
-            model=self.llm_config.model,
-            temperature=self.llm_config.temperature,
-            timeout=self.llm_config.timeout
-        )
+        # LLM 客户端在首次使用时创建（纯规则分析的智能体不会加载 langchain_deepseek）
+        self._llm = None
         
         # 初始化缓存
-        if self.cache_config.enabled:
-            self.cache = SimpleCache(
-                ttl=self.cache_config.ttl,
-                max_size=self.cache_config.max_size
-            )
-        else:
-            self.cache = None
+        self.cache: Optional[CacheBackend] = create_cache(self.cache_config)
+        
+        # 初始化语义缓存（可选依赖缺失时自动关闭）
+        self.semantic_cache = None
+        if self.cache_config.enabled and self.cache_config.semantic_enabled:
+            if np is None:
+                self.logger.warning("⚠️ 未安装numpy，语义缓存已禁用")
+            else:
+                self.semantic_cache = SemanticCache(
+                    model_name=self.cache_config.semantic_model,
+                    threshold=self.cache_config.semantic_threshold,
+                    max_size=self.cache_config.semantic_max_size
+                )
         
         # 性能指标
-        self._performance_metrics = []
+        self._performance_metrics = deque(maxlen=PERFORMANCE_HISTORY_SIZE)
         
-        self.logger.info(f"✅ {agent_name} 初始化完成 (缓存: {self.cache_config.enabled})")
+        self.logger.info(
+            f"✅ {agent_name} 初始化完成 (缓存: {self.cache_config.enabled}, 后端: {self.cache_config.backend})"
+        )
+    
+    @property
+    def llm(self):
+        """LLM 客户端（首次访问时创建）"""
+        if self._llm is None:
+            from langchain_deepseek import ChatDeepSeek
+            self._llm = ChatDeepSeek(
+                api_key=self.llm_config.api_key,
+                model=self.llm_config.model,
+                temperature=self.llm_config.temperature,
+                timeout=self.llm_config.timeout
+            )
+        return self._llm
+    
+    @llm.setter
+    def llm(self, value):
+        self._llm = value
+    
+    def _build_llm_signature(self) -> bytes:
+        """构建LLM配置签名，避免不同模型/提示词之间共享缓存结果"""
+        prompt_digest = hashlib.blake2b(self.system_prompt.encode(), digest_size=8).hexdigest()
+        return (
+            f"v{self.cache_config.version}|{self.agent_name}|{self.llm_config.model}|"
+            f"{self.llm_config.temperature}|{prompt_digest}|"
+        ).encode()
     
     def _generate_cache_key(self, text: str, context: Optional[str] = None) -> str:
         """生成缓存键"""
-        content = text + (context or "")
-        return hashlib.md5(content.encode()).hexdigest()
+        # 分段喂入哈希，避免为拼接大文本额外分配字符串
+        h = _new_key_hasher()
+        h.update(self._llm_signature)
+        h.update(text.encode())
+        if context:
+            h.update(context.encode())
+        return h.hexdigest()
     
     def _preprocess_text(self, text: str) -> str:
         """文本预处理"""
@@ -164,7 +524,7 @@ class BaseAgent(Runnable):
             return text
         
         # 移除多余空白
-        text = ' '.join(text.split())
+        text = _WS_RE.sub(" ", text).strip()
         
         # 截断过长文本
         if len(text) > self.processing_config.max_text_length:
@@ -191,15 +551,21 @@ class BaseAgent(Runnable):
         chunks.append(text[:chunk_size])
         
         # 提取中间重要句子（包含关键词的）
-        important_keywords = ['风险', '违约', '责任', '义务', '权利', '付款', '价格', '标准', '要求']
         middle_text = text[chunk_size:-chunk_size] if len(text) > chunk_size * 2 else ""
         
         if middle_text:
             sentences = middle_text.split('。')
-            important_sentences = [
-                s for s in sentences 
-                if any(kw in s for kw in important_keywords)
-            ][:10]  # 最多10句
+            # 各句起始偏移，用于把关键词命中位置映射回句子
+            sentence_starts = list(accumulate((len(s) + 1 for s in sentences[:-1]), initial=0))
+            important_sentences = []
+            last_index = -1
+            for match in _IMPORTANT_KEYWORDS_RE.finditer(middle_text):
+                index = bisect_right(sentence_starts, match.start()) - 1
+                if index != last_index:
+                    important_sentences.append(sentences[index])
+                    last_index = index
+                    if len(important_sentences) >= 10:  # 最多10句
+                        break
             chunks.extend(important_sentences)
         
         # 保留结尾部分
@@ -222,23 +588,63 @@ class BaseAgent(Runnable):
         context = input.get("context", "")
         return self.process_text_message(user_text, context)
     
-    @performance_monitor
-    @retry_on_error(max_retries=3, delay=1.0)
-    def call_llm(
-        self, 
-        user_message: str, 
-        conversation_history: Optional[List[Dict]] = None,
-        use_cache: bool = True
-    ) -> str:
-        """调用LLM（带缓存和重试机制）"""
+    async def ainvoke(self, input: dict, config=None, **kwargs):
+        """异步 invoke：子类只重写了同步处理方法时，放到线程中执行同步版本"""
+        cls = type(self)
+        if cls.invoke is not BaseAgent.invoke or (
+            cls.aprocess_text_message is BaseAgent.aprocess_text_message
+            and cls.process_text_message is not BaseAgent.process_text_message
+        ):
+            return await asyncio.to_thread(self.invoke, input, config, **kwargs)
+        
+        user_text = input.get("text", "")
+        context = input.get("context", "")
+        return await self.aprocess_text_message(user_text, context)
+    
+    def _uses_semantic_cache(
+        self,
+        use_cache: bool,
+        semantic_key: Optional[str],
+        conversation_history: Optional[List[Dict]]
+    ) -> bool:
+        """是否对本次调用查找语义缓存（仅对提供了语义键、无对话历史的单轮请求）"""
+        return use_cache and self.semantic_cache is not None and semantic_key is not None and not conversation_history
+    
+    def _prepare_llm_call(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict]],
+        use_cache: bool,
+        semantic_key: Optional[str] = None
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """检查缓存并构建消息列表，返回 (缓存结果, 调用状态)"""
+        call_state = {"cache_key": None, "query_embedding": None, "messages": None}
         
         # 检查缓存
         if use_cache and self.cache:
             cache_key = self._generate_cache_key(user_message)
+            call_state["cache_key"] = cache_key
             cached_result = self.cache.get(cache_key)
             if cached_result:
                 self.logger.info("✨ 缓存命中")
-                return cached_result
+                return cached_result, call_state
+        
+        # 检查语义缓存：只比较提示词中可变的文档部分，固定的指令前缀会占满模型的输入窗口
+        if self._uses_semantic_cache(use_cache, semantic_key, conversation_history):
+            try:
+                if self.semantic_cache.fits(semantic_key):
+                    semantic_result, call_state["query_embedding"] = self.semantic_cache.lookup(semantic_key)
+                else:
+                    semantic_result = None
+            except Exception as e:
+                self.logger.warning(f"⚠️ 语义缓存不可用，已禁用: {e}")
+                self.semantic_cache = None
+            else:
+                if semantic_result:
+                    self.logger.info("✨ 语义缓存命中")
+                    if self.cache:
+                        self.cache.set(call_state["cache_key"], semantic_result)
+                    return semantic_result, call_state
         
         # 预处理和压缩
         processed_message = self._preprocess_text(user_message)
@@ -246,27 +652,170 @@ class BaseAgent(Runnable):
             processed_message = self._compress_text(processed_message)
         
         # 构建消息列表
-        messages = [SystemMessage(content=self.system_prompt)]
-        
+        messages = [self._system_msg]
         if conversation_history:
-            for msg in conversation_history:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-        
+            messages.extend(self._convert_history(conversation_history))
         messages.append(HumanMessage(content=processed_message))
+        call_state["messages"] = messages
+        
+        return None, call_state
+    
+    def _llm_cache_blocks(
+        self,
+        use_cache: bool,
+        semantic_key: Optional[str],
+        conversation_history: Optional[List[Dict]]
+    ) -> bool:
+        """本次调用的缓存检查是否会阻塞（Redis 网络往返或计算语义向量）"""
+        if not use_cache:
+            return False
+        if self.cache is not None and self.cache.blocking:
+            return True
+        return self._uses_semantic_cache(use_cache, semantic_key, conversation_history)
+    
+    async def _aprepare_llm_call(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict]],
+        use_cache: bool,
+        semantic_key: Optional[str] = None
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """异步路径的缓存检查：会阻塞时放到线程中执行，不占用事件循环"""
+        if self._llm_cache_blocks(use_cache, semantic_key, conversation_history):
+            return await asyncio.to_thread(
+                self._prepare_llm_call, user_message, conversation_history, use_cache, semantic_key
+            )
+        return self._prepare_llm_call(user_message, conversation_history, use_cache, semantic_key)
+    
+    def _limited_llm_invoke(self, messages: Any) -> Any:
+        """同步调用LLM客户端（占用进程内共用的并发名额）"""
+        with LLM_LIMITER:
+            return self.llm.invoke(messages)
+    
+    def _convert_history(self, conversation_history: List[Dict[str, str]]) -> List[Any]:
+        """将对话历史转换为消息对象，相同历史复用已转换的结果"""
+        key = tuple((msg["role"], msg["content"]) for msg in conversation_history)
+        converted = self._history_cache.get(key)
+        if converted is not None:
+            self._history_cache.move_to_end(key)
+            return converted
+        
+        converted = [
+            _ROLE_MESSAGE_CLASSES[role](content=content)
+            for role, content in key
+            if role in _ROLE_MESSAGE_CLASSES
+        ]
+        self._history_cache[key] = converted
+        if len(self._history_cache) > HISTORY_CACHE_SIZE:
+            self._history_cache.popitem(last=False)
+        return converted
+    
+    def _store_llm_result(self, result: str, call_state: Dict[str, Any]):
+        """缓存LLM结果"""
+        if call_state["cache_key"] is not None:
+            self.cache.set(call_state["cache_key"], result)
+        if call_state["query_embedding"] is not None and self.semantic_cache is not None:
+            self.semantic_cache.add(call_state["query_embedding"], result)
+    
+    async def _astore_llm_result(self, result: str, call_state: Dict[str, Any]):
+        """异步路径缓存LLM结果（写入 Redis 时放到线程中执行）"""
+        if call_state["cache_key"] is not None and self.cache.blocking:
+            await asyncio.to_thread(self._store_llm_result, result, call_state)
+        else:
+            self._store_llm_result(result, call_state)
+    
+    async def _acache_get(self, key: str) -> Optional[Any]:
+        """在异步代码中读取缓存（网络后端放到线程中执行）"""
+        if self.cache.blocking:
+            return await asyncio.to_thread(self.cache.get, key)
+        return self.cache.get(key)
+    
+    async def _acache_set(self, key: str, value: Any):
+        """在异步代码中写入缓存（网络后端放到线程中执行）"""
+        if self.cache.blocking:
+            await asyncio.to_thread(self.cache.set, key, value)
+        else:
+            self.cache.set(key, value)
+    
+    @performance_monitor
+    @retry_on_error(max_retries=3, delay=1.0)
+    def call_llm(
+        self, 
+        user_message: str, 
+        conversation_history: Optional[List[Dict]] = None,
+        use_cache: bool = True,
+        semantic_key: Optional[str] = None
+    ) -> str:
+        """调用LLM（带缓存和重试机制）
+        
+        semantic_key 为提示词中可变的文档文本，提供时按其向量查找语义缓存；
+        同一智能体只应有一种提示词使用语义缓存
+        """
+        cached_result, call_state = self._prepare_llm_call(
+            user_message, conversation_history, use_cache, semantic_key
+        )
+        if cached_result:
+            return cached_result
         
         # 调用LLM
-        response = self.llm.invoke(messages)
+        response = self._limited_llm_invoke(call_state["messages"])
         result = response.content
         
-        # 缓存结果
-        if use_cache and self.cache:
-            self.cache.set(cache_key, result)
+        self._store_llm_result(result, call_state)
+        return result
+    
+    @performance_monitor
+    @retry_on_error(max_retries=3, delay=1.0)
+    async def acall_llm(
+        self, 
+        user_message: str, 
+        conversation_history: Optional[List[Dict]] = None,
+        use_cache: bool = True,
+        semantic_key: Optional[str] = None
+    ) -> str:
+        """异步调用LLM（带缓存和重试机制），不阻塞事件循环"""
+        cached_result, call_state = await self._aprepare_llm_call(
+            user_message, conversation_history, use_cache, semantic_key
+        )
+        if cached_result:
+            return cached_result
         
+        # 调用LLM
+        async with LLM_LIMITER:
+            response = await self.llm.ainvoke(call_state["messages"])
+        result = response.content
+        
+        await self._astore_llm_result(result, call_state)
         return result
     
+    async def call_llm_stream(
+        self, 
+        user_message: str, 
+        conversation_history: Optional[List[Dict]] = None,
+        use_cache: bool = True,
+        semantic_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """流式调用LLM，逐段产出文本；生成结束后将完整结果写入缓存"""
+        cached_result, call_state = await self._aprepare_llm_call(
+            user_message, conversation_history, use_cache, semantic_key
+        )
+        if cached_result:
+            yield cached_result
+            return
+        
+        chunks = []
+        async with LLM_LIMITER:
+            async for chunk in self.llm.astream(call_state["messages"]):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+        
+        await self._astore_llm_result("".join(chunks), call_state)
+    
+    def stream_text_message(self, user_text: str, context: str = "") -> AsyncIterator[str]:
+        """流式处理文本消息"""
+        return self.call_llm_stream(self._combine_context(user_text, context))
+    
     @performance_monitor
     def process_text_message(self, user_text: str, context: str = "") -> str:
         """处理文本消息（优化版本）"""
@@ -275,29 +824,69 @@ class BaseAgent(Runnable):
             if len(user_text) < self.processing_config.min_text_length:
                 return "输入文本过短，请提供更多内容以进行分析。"
             
-            self.logger.info(
-                f"📝 处理消息: {len(user_text)} 字符"
-                + (f" (上下文: {len(context)} 字符)" if context else "")
-            )
+            if context:
+                self.logger.info("📝 处理消息: %d 字符 (上下文: %d 字符)", len(user_text), len(context))
+            else:
+                self.logger.info("📝 处理消息: %d 字符", len(user_text))
+            
+            # 调用LLM
+            response_text = self.call_llm(self._combine_context(user_text, context))
+            
+            return response_text
+            
+        except Exception as e:
+            self.logger.error("❌ 消息处理错误: %s", e, exc_info=True)
+            return f"处理消息时发生错误：{str(e)}"
+    
+    @performance_monitor
+    async def aprocess_text_message(self, user_text: str, context: str = "") -> str:
+        """异步处理文本消息"""
+        try:
+            # 验证输入
+            if len(user_text) < self.processing_config.min_text_length:
+                return "输入文本过短，请提供更多内容以进行分析。"
             
-            # 组合文本和上下文
-            full_text = user_text
             if context:
-                full_text = f"上下文信息：\n{context}\n\n待分析内容：\n{user_text}"
+                self.logger.info("📝 处理消息: %d 字符 (上下文: %d 字符)", len(user_text), len(context))
+            else:
+                self.logger.info("📝 处理消息: %d 字符", len(user_text))
             
             # 调用LLM
-            response_text = self.call_llm(full_text)
+            response_text = await self.acall_llm(self._combine_context(user_text, context))
             
             return response_text
             
         except Exception as e:
-            self.logger.error(f"❌ 消息处理错误: {str(e)}", exc_info=True)
+            self.logger.error("❌ 消息处理错误: %s", e, exc_info=True)
             return f"处理消息时发生错误：{str(e)}"
     
+    def extract_task_info(self, text: str) -> Dict[str, Any]:
+        """从输入文本中提取任务信息，「上下文：」之后的全部内容为待分析文档"""
+        task_info = {"content": text}
+        
+        # 只扫描一遍文本，直接用匹配位置截取上下文
+        for m in _TASK_LINE_RE.finditer(text):
+            if m.group(1) == "任务":
+                task_info["task"] = m.group(2).strip()
+            else:
+                task_info["content"] = text[m.start(2):].strip()
+                break
+        
+        return task_info
+    
+    def _combine_context(self, user_text: str, context: str = "") -> str:
+        """组合文本和上下文"""
+        if context:
+            return f"上下文信息：\n{context}\n\n待分析内容：\n{user_text}"
+        return user_text
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         if self.cache:
-            return self.cache.stats()
+            stats = self.cache.stats()
+            if self.semantic_cache:
+                stats["semantic"] = self.semantic_cache.stats()
+            return stats
         return {"enabled": False}
     
     def get_performance_stats(self) -> Dict[str, Any]:
@@ -306,18 +895,30 @@ class BaseAgent(Runnable):
             return {"total_calls": 0}
         
         total_calls = len(self._performance_metrics)
-        total_time = sum(m["elapsed"] for m in self._performance_metrics)
+        total_time = sum(m[1] for m in self._performance_metrics) / 1e9
         avg_time = total_time / total_calls
         
+        # 最近10次调用
+        recent_calls = [
+            {
+                "function": func_name,
+                "elapsed": elapsed_ns / 1e9,
+                "timestamp": datetime.fromtimestamp(ts_ns / 1e9).isoformat()
+            }
+            for func_name, elapsed_ns, ts_ns in list(self._performance_metrics)[-10:]
+        ]
+        
         return {
             "total_calls": total_calls,
             "total_time": total_time,
             "avg_time": avg_time,
-            "recent_calls": self._performance_metrics[-10:]  # 最近10次调用
+            "recent_calls": recent_calls
         }
     
     def clear_cache(self):
         """清空缓存"""
+        if self.semantic_cache:
+            self.semantic_cache.clear()
         if self.cache:
             self.cache.clear()
             self.logger.info("🗑️ 缓存已清空")
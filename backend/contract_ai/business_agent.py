@@ -1,7 +1,443 @@
 import json
 import re
-from typing import Dict, List, Any, Optional
-from base_agent import BaseAgent
+import math
+import asyncio
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, replace
+from functools import cache, wraps
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Set, Tuple
+from contract_ai.base_agent import BaseAgent, SimpleCache
+from contract_ai.config import Config
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# orjson 的缩进输出与 json.dumps(ensure_ascii=False, indent=2) 一致，未安装时回退到标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ==================== 预编译正则 ====================
+# 模块加载时编译一次，避免每次分析都经过 re 的内部缓存查找
+# 只用于带捕获组/量词的模式和逐行匹配；纯字面量的判断走下方的关键词扫描
+# 安装了 google-re2 时使用 RE2（线性时间匹配，无回溯风险），否则回退到标准库 re
+# 文本保持为 str：中文在 str 中每字占 2 字节，UTF-8 编码后每字 3 字节，改用 bytes 反而更占内存
+try:
+    import re2
+
+    _RE2_OPTIONS = re2.Options()
+    _RE2_OPTIONS.max_mem = 8 << 20
+
+    def _compile(pattern: str):
+        return re2.compile(pattern, options=_RE2_OPTIONS)
+except ImportError:
+    _compile = re.compile
+
+# 当事人
+_PARTY_PATTERNS = [
+    (_compile(r'甲方：(.*?)\n'), '甲方'),
+    (_compile(r'乙方：(.*?)\n'), '乙方'),
+    (_compile(r'丙方：(.*?)\n'), '丙方'),
+    (_compile(r'甲方名称：(.*?)\n'), '甲方'),
+    (_compile(r'乙方名称：(.*?)\n'), '乙方'),
+    (_compile(r'甲方全称：(.*?)\n'), '甲方'),
+    (_compile(r'乙方全称：(.*?)\n'), '乙方')
+]
+
+# 合同标的与价款
+_SPEC_PATTERNS = [
+    _compile(r'规格：(.*?)\n'),
+    _compile(r'型号：(.*?)\n'),
+    _compile(r'数量：(.*?)\n'),
+    _compile(r'标准：(.*?)\n')
+]
+# 含 \d 的模式保留标准库 re：RE2 的 \d 只匹配 ASCII 数字，会漏掉全角数字
+_PERCENT_RE = re.compile(r'(\d+)%')
+
+# 履行与期限
+_LOCATION_VALUE_RE = _compile(r'地点：(.*?)\n')
+_PARTY_A_OBLIGATION_RE = _compile(r'甲方应|甲方负责')
+_PARTY_B_OBLIGATION_RE = _compile(r'乙方应|乙方负责')
+_PERIOD_RE = _compile(r'有效期(.*?)年|期限(.*?)年')
+_EFFECTIVE_DATE_VALUE_RE = _compile(r'生效日期：(.*?)\n')
+_CONDITIONAL_EFFECT_RE = _compile(r'自.*?之日起生效')
+_TERMINATION_DATE_VALUE_RE = _compile(r'终止日期：(.*?)\n')
+# 「N日内……交付」等期限：同一行内「日内」之后出现的关键词 -> 期限类型
+_TIME_LIMIT_TERMS = (
+    ('交付', '交付期限'),
+    ('付款', '付款期限'),
+    ('回复', '回复期限'),
+    ('履行', '履行期限')
+)
+
+# 质量与验收（逐行匹配）
+_QUALITY_STANDARD_RE = _compile(r'质量标准|质量要求|应符合')
+_ACCEPTANCE_CRITERIA_RE = _compile(r'验收标准|验收条件|视为合格')
+_INSPECTION_RE = _compile(r'检验|检查|验收程序|验收流程')
+
+# 权利义务
+_CONFIDENTIALITY_DURATION_RE = _compile(r'保密期(.*?)年|保密义务(.*?)年')
+
+# 违约与终止
+_BREACH_RE = _compile(r'违约|视为违约|构成违约')
+_LIQUIDATED_AMOUNT_RE = _compile(r'违约金(.*?)(元|%)')
+_POST_TERMINATION_VALUE_RE = _compile(r'终止后(.*?)\n')
+_TERMINATION_RIGHT_PATTERNS = [
+    (_compile(r'甲方有权.*?解除|甲方有权.*?终止'), '甲方'),
+    (_compile(r'乙方有权.*?解除|乙方有权.*?终止'), '乙方'),
+    (_compile(r'双方均有权.*?解除|双方均有权.*?终止'), '双方')
+]
+
+# 争议解决
+
+# 模糊表述（原逐条匹配的 `.*?` 后缀可匹配空串，合并为一个交替式结果不变）
+_AMBIGUITY_RE = _compile(r'视情况而定|双方另行协商|届时确定|合理的|适当的|必要时')
+
+# ==================== 合同审查指标 ====================
+# 只读元数据，所有实例共享，不再每次实例化时重建
+_CONTRACT_METRICS = {
+    "合同主体": (
+        "甲方", "乙方", "丙方", "当事人", "主体", "资格", "资质", "权限", "授权"
+    ),
+    "合同标的": (
+        "标的", "标的物", "标的额", "产品", "服务", "内容", "范围", "数量", "规格"
+    ),
+    "权利义务": (
+        "权利", "义务", "责任", "权限", "职责", "应尽", "享有", "承担"
+    ),
+    "价格支付": (
+        "价款", "金额", "支付", "付款", "结算", "发票", "税率", "定金", "预付款"
+    ),
+    "履行期限": (
+        "期限", "时间", "日期", "有效期", "起始日", "截止日", "履行期", "工期"
+    ),
+    "质量标准": (
+        "质量", "标准", "规范", "要求", "验收", "检验", "合格", "达标"
+    ),
+    "违约责任": (
+        "违约", "责任", "赔偿", "违约金", "罚金", "处罚", "损失", "补救"
+    ),
+    "争议解决": (
+        "争议", "纠纷", "解决", "诉讼", "仲裁", "管辖", "法院", "调解"
+    ),
+    "知识产权": (
+        "知识产权", "专利", "商标", "著作权", "版权", "许可", "转让", "归属"
+    ),
+    "保密条款": (
+        "保密", "秘密", "不得泄露", "保密义务", "保密期限", "涉密信息"
+    ),
+    "不可抗力": (
+        "不可抗力", "意外事件", "不可预见", "无法避免", "免责", "情势变更"
+    ),
+    "合同生效": (
+        "生效", "成立", "生效条件", "签署", "盖章", "批准", "备案"
+    ),
+    "合同终止": (
+        "终止", "解除", "终止条件", "解除权", "终止后果", "解除程序"
+    )
+}
+CONTRACT_METRICS = MappingProxyType(_CONTRACT_METRICS)
+
+# ==================== 关键词清单 ====================
+# 全文关键词集合：所有关键词在一次扫描中同时匹配
+_DOCUMENT_KEYWORDS: Set[str] = set()
+
+def _terms(*keywords: str) -> Tuple[str, ...]:
+    """登记一组关键词到全文扫描集合，并按原顺序返回"""
+    _DOCUMENT_KEYWORDS.update(keywords)
+    return keywords
+
+# 当事人
+_PARTY_MENTION_TERMS = _terms('甲方', '乙方')
+_QUALIFICATION_TERMS = _terms('资质', '资格', '许可', '认证')
+_QUALIFICATION_KEYWORDS = _terms('营业执照', '经营许可证', '资质证书', '专业认证', '行业许可')
+_AUTHORIZATION_TERMS = _terms('授权', '委托', '代表权', '签字权')
+_AUTHORIZATION_TYPE_TERMS = [
+    (_terms('法定代表人', '法人'), "法定代表人授权"),
+    (_terms('授权委托书', '委托书'), "授权委托书"),
+    (_terms('公章', '合同章'), "印章授权")
+]
+_LEGAL_PERSON_TERMS = _terms('公司', '企业', '法人', '组织')
+_NATURAL_PERSON_TERMS = _terms('个人', '自然人')
+
+# 合同标的与价款
+_SUBJECT_KEYWORDS = _terms('标的', '标的物', '产品', '服务', '内容', '范围')
+_SCOPE_TERMS = _terms('范围', '包括', '包含', '除外', '不包括')
+_PRICE_TYPE_TERMS = [
+    (_terms('固定价', '包干价', '总价'), "固定价格"),
+    (_terms('单价', '单位价格'), "单价形式"),
+    (_terms('成本加', '可调价'), "可调价格")
+]
+_PAYMENT_CONDITION_TERMS = [
+    (_terms('验收合格后', '验收通过后'), "验收合格后付款"),
+    (_terms('发货后', '交付后'), "交付后付款"),
+    (_terms('见票后', '收到发票后'), "收到发票后付款")
+]
+_TAX_TERMS = _terms('税', '税率', '发票', '税额')
+_TAX_BEARING_TERMS = [
+    (_terms('甲方承担', '买方承担'), "甲方承担"),
+    (_terms('乙方承担', '卖方承担'), "乙方承担")
+]
+_PAYMENT_KEYWORDS = ['预付', '首付', '进度款', '尾款', '分期', '结算', '到期付款']
+_PAYMENT_KEYWORD_RE = _compile('|'.join(map(re.escape, _PAYMENT_KEYWORDS)))
+
+# 履行与期限
+_LOCATION_TERMS = _terms('地点', '地址', '场所')
+_METHOD_TERMS = _terms('方式', '方法', '途径')
+_EFFECTIVE_DATE_TERMS = _terms('生效日期', '生效日')
+_TERMINATION_DATE_TERMS = _terms('终止日期', '到期日')
+
+# 权利义务（计数用的字面量互不重叠，str.count 之和等于原正则 findall 的匹配数）
+_PARTY_A_RIGHTS_TERMS = ('甲方有权', '甲方享有')
+_PARTY_B_RIGHTS_TERMS = ('乙方有权', '乙方享有')
+_PARTY_A_DUTIES_TERMS = ('甲方应', '甲方负责', '甲方承担')
+_PARTY_B_DUTIES_TERMS = ('乙方应', '乙方负责', '乙方承担')
+_IP_TERMS = _terms('知识产权', '专利', '商标', '著作权', '版权')
+_IP_OWNERSHIP_TERMS = [
+    (_terms('归甲方所有', '甲方享有'), "归甲方所有"),
+    (_terms('归乙方所有', '乙方享有'), "归乙方所有"),
+    (_terms('共有', '双方共有'), "双方共有")
+]
+_LICENSE_TERMS = _terms('许可', '授权', '使用权')
+_INFRINGEMENT_TERMS = _terms('侵权', '责任', '赔偿')
+_CONFIDENTIALITY_TERMS = _terms('保密', '秘密', '不得泄露')
+_CONFIDENTIALITY_EXCEPTION_TERMS = _terms('公开信息', '已获知', '法律要求')
+
+# 违约与终止
+_REMEDY_KEYWORDS = {
+    '继续履行': _terms('继续履行', '强制履行'),
+    '采取补救措施': _terms('补救', '采取措施', '纠正'),
+    '赔偿损失': _terms('赔偿', '赔偿损失', '补偿'),
+    '支付违约金': _terms('违约金', '罚金', '支付罚款'),
+    '解除合同': _terms('解除合同', '终止合同')
+}
+_LIQUIDATED_DAMAGES_TERMS = _terms('违约金', '罚金', '违约金额')
+_TERMINATION_NOTICE_TERMS = _terms('通知', '期限', '书面形式')
+_TERMINATION_TERMS = _terms('终止', '解除')
+_POST_TERMINATION_TERMS = _terms('终止后', '解除后')
+_FORCE_MAJEURE_EVENTS = _terms('战争', '自然灾害', '地震', '洪水', '疫情', '政府行为', '罢工')
+_FORCE_MAJEURE_NOTICE_TERMS = _terms('通知', '期限', '书面')
+_FORCE_MAJEURE_CONSEQUENCE_TERMS = _terms('延期', '中止', '解除', '免责')
+
+# 争议解决与合规
+_ADR_TERMS = _terms('协商', '调解', '和解')
+_COURT_TERMS = _terms('法院', '管辖')
+_LOCAL_JURISDICTION_TERMS = _terms('甲方所在地', '乙方所在地')
+_APPLICABLE_LAW_TERMS = _terms('适用法律', '依据法律')
+_LAW_KEYWORDS = _terms('民法典', '合同法', '公司法', '招标投标法', '知识产权法')
+_INDUSTRY_REGULATION_TERMS = _terms('行业规定', '行业标准', '监管要求')
+_APPROVAL_TERMS = _terms('审批', '批准', '备案')
+_REPORTING_TERMS = _terms('报告', '报送', '申报')
+
+# 可执行性
+_AMBIGUITY_INDICATORS = _terms('可能', '或许', '大概', '适当', '合理', '另行协商', '届时确定')
+_KEY_TERMS = _terms('标的', '价格', '履行', '期限', '质量', '违约责任', '争议解决', '生效', '当事人')
+
+# 风险预检：一个都未出现时可跳过 LLM 详细分析
+_RISK_TRIAGE_TERMS = _terms('违约', '争议', '不可抗力')
+
+# 单独判断的字面量
+_terms(
+    '增值税专用发票', '普通发票', '自签署之日起生效', '有效期届满自动终止', '永久保密',
+    '不可抗力', '诉讼', '仲裁', '仲裁委员会', '违约责任', '争议解决', '生效日期'
+)
+
+# 逐行提取的类别：每个模式在全文上查找，命中后取所在行并跳到行尾继续
+_LINE_CATEGORY_PATTERNS = {
+    "payment": _PAYMENT_KEYWORD_RE,
+    "party_a_obligation": _PARTY_A_OBLIGATION_RE,
+    "party_b_obligation": _PARTY_B_OBLIGATION_RE,
+    "quality_standard": _QUALITY_STANDARD_RE,
+    "acceptance_criteria": _ACCEPTANCE_CRITERIA_RE,
+    "inspection": _INSPECTION_RE,
+    "breach": _BREACH_RE,
+    "ambiguity": _AMBIGUITY_RE
+}
+# 各类别的模式都是字面量的并集：关键词扫描没有命中其中任何一个时，该类别不必运行正则
+_LINE_CATEGORY_TERMS = {
+    category: _terms(*pattern.pattern.split('|'))
+    for category, pattern in _LINE_CATEGORY_PATTERNS.items()
+}
+
+# 最长关键词的长度，决定分块扫描时相邻块的重叠量
+_LONGEST_KEYWORD = max(map(len, _DOCUMENT_KEYWORDS))
+
+@cache
+def _keyword_automaton():
+    """构建全部关键词的 Aho-Corasick 自动机（首次使用时构建，进程内共享）"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in _DOCUMENT_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+def _count_terms(text: str, terms: Tuple[str, ...]) -> int:
+    """统计字面量出现次数（不生成匹配列表）"""
+    return sum(text.count(term) for term in terms)
+
+# 无自动机时逐块查找关键词的块大小（字符数），块在 L2 缓存内反复查找
+KEYWORD_SCAN_CHUNK_SIZE = 1 << 16
+
+def _chunked(text: str, size: int, overlap: int):
+    """按 size 切块，相邻块重叠 overlap 个字符，跨块的关键词不会被漏掉"""
+    step = size - overlap
+    for start in range(0, max(len(text) - overlap, 1), step):
+        yield text[start:start + size]
+
+def _scan_keywords(text: str) -> Set[str]:
+    """扫描文本，返回出现过的关键词集合"""
+    automaton = _keyword_automaton()
+    if automaton is not None:
+        # 单次线性扫描，重叠的关键词（如 标的/标的物）都会命中
+        return {keyword for _, keyword in automaton.iter(text)}
+    
+    # 长文档逐块查找，已命中的关键词不再在后续块中查找
+    hits = set()
+    remaining = _DOCUMENT_KEYWORDS
+    for chunk in _chunked(text, KEYWORD_SCAN_CHUNK_SIZE, _LONGEST_KEYWORD - 1):
+        found = {keyword for keyword in remaining if keyword in chunk}
+        if found:
+            hits |= found
+            remaining = remaining - found
+            if not remaining:
+                break
+    return hits
+
+# 预检判定为低风险、跳过 LLM 时返回的详细分析
+LOW_RISK_ANALYSIS = "规则预检未发现违约、争议或不可抗力相关条款，判定为低风险合同，未进行LLM详细分析。"
+
+# 同时保留中间结果的文档数（并发审查的文档各占一项，按最近使用淘汰）
+DOCUMENT_MEMO_SIZE = 8
+
+# 按合同内容缓存的分析结果条数（合同文本不变则结果不变，因此不设过期时间）
+ANALYSIS_CACHE_SIZE = 256
+
+def _scan_time_limits(text: str) -> Dict[str, str]:
+    """一次扫描提取各类期限的天数（等价于逐类型搜索 (\\d+)日内.*?关键词 的首个匹配）"""
+    found = {}
+    pos = text.find('日内')
+    while pos != -1 and len(found) < len(_TIME_LIMIT_TERMS):
+        # 只在「日内」附近向前取连续数字，代替全文跑正则引擎
+        start = pos
+        while start and text[start - 1].isdecimal():
+            start -= 1
+        if start < pos:
+            line_end = text.find('\n', pos)
+            if line_end == -1:
+                line_end = len(text)
+            for keyword, limit_type in _TIME_LIMIT_TERMS:
+                if limit_type not in found and text.find(keyword, pos + 2, line_end) != -1:
+                    found[limit_type] = text[start:pos]
+        pos = text.find('日内', pos + 2)
+    return found
+
+def _line_prefix(text: str, marker: str, follow: str = "") -> Optional[str]:
+    """返回首个「marker 之后同一行还出现 follow」的行中 marker 之前的内容（等价于 (.*?)marker.*?follow 的捕获组）"""
+    pos = text.find(marker)
+    while pos != -1:
+        line_end = text.find('\n', pos)
+        if line_end == -1:
+            line_end = len(text)
+        if text.find(follow, pos + len(marker), line_end) != -1:
+            return text[text.rfind('\n', 0, pos) + 1:pos]
+        # 同一行后面的 marker 之后不会再有 follow，直接跳到下一行
+        pos = text.find(marker, line_end)
+    return None
+
+def _scan_line_categories(text: str, hits: Set[str]) -> Dict[str, List[Tuple[int, str]]]:
+    """按类别返回命中的行 (行首偏移, 行内容)，不需要先把全文切分成行"""
+    line_index = {}
+    for category, pattern in _LINE_CATEGORY_PATTERNS.items():
+        matched = []
+        line_index[category] = matched
+        # 按本文档实际出现的关键词裁剪：不可能命中的类别直接跳过
+        if hits.isdisjoint(_LINE_CATEGORY_TERMS[category]):
+            continue
+        # 不使用 (?m)^.*?(...).*$：CPython 的 re 会在每行回溯，实测比直接查找慢约 3 倍
+        match = pattern.search(text)
+        while match is not None:
+            pos = match.start()
+            start = text.rfind('\n', 0, pos) + 1
+            end = text.find('\n', pos)
+            if end == -1:
+                end = len(text)
+            matched.append((start, text[start:end]))
+            # 同一行只取一次，从行尾继续查找
+            match = pattern.search(text, end)
+    return line_index
+
+def _content_key(text: str) -> str:
+    """合同内容哈希，作为分析结果缓存的键"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def _per_document(method):
+    """按文档缓存方法结果：同一次审查中对同一文本的重复调用直接复用"""
+    name = method.__name__
+    
+    @wraps(method)
+    def wrapper(self, text: str):
+        memo = self._document_memo(text)
+        if name not in memo:
+            memo[name] = method(self, text)
+        return memo[name]
+    return wrapper
+
+# ==================== 分析结果 ====================
+# 使用 __slots__ 数据类保存分析结果，只在返回响应时转换为字典
+@dataclass(slots=True, frozen=True)
+class PartyRef:
+    type: str
+    name: str
+
+@dataclass(slots=True, frozen=True)
+class PaymentTerm:
+    type: str
+    description: str
+    percentage: Optional[str]
+
+@dataclass(slots=True, frozen=True)
+class Obligation:
+    party: str
+    obligation: str
+
+@dataclass(slots=True, frozen=True)
+class TimeLimit:
+    type: str
+    duration: str
+
+@dataclass(slots=True, frozen=True)
+class TerminationRight:
+    party: str
+    right: str
+
+@dataclass(slots=True, frozen=True)
+class Recommendation:
+    priority: str
+    recommendation: str
+
+@dataclass(slots=True)
+class ContractAnalysis:
+    party_analysis: Dict[str, Any]
+    term_analysis: Dict[str, Any]
+    obligation_analysis: Dict[str, Any]
+    risk_analysis: Dict[str, Any]
+    compliance_analysis: Dict[str, Any]
+    enforceability_analysis: Dict[str, Any]
+    recommendations: List[Recommendation]
+    detailed_analysis: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典（递归展开嵌套的数据类）"""
+        return asdict(self)
 
 class ContractReviewAgent(BaseAgent):
     """Agent specialized in contract review and legal analysis"""
@@ -37,51 +473,55 @@ class ContractReviewAgent(BaseAgent):
 - 为合同完善或签署决策提供专业支持"""
 
         super().__init__(agent_name="ContractReviewAgent", system_prompt=system_prompt)
-        self.contract_metrics = self.initialize_contract_metrics()
-    
-    def initialize_contract_metrics(self) -> Dict[str, List[str]]:
-        """Initialize contract document review metrics and keywords"""
-        return {
-            "合同主体": [
-                "甲方", "乙方", "丙方", "当事人", "主体", "资格", "资质", "权限", "授权"
-            ],
-            "合同标的": [
-                "标的", "标的物", "标的额", "产品", "服务", "内容", "范围", "数量", "规格"
-            ],
-            "权利义务": [
-                "权利", "义务", "责任", "权限", "职责", "应尽", "享有", "承担"
-            ],
-            "价格支付": [
-                "价款", "金额", "支付", "付款", "结算", "发票", "税率", "定金", "预付款"
-            ],
-            "履行期限": [
-                "期限", "时间", "日期", "有效期", "起始日", "截止日", "履行期", "工期"
-            ],
-            "质量标准": [
-                "质量", "标准", "规范", "要求", "验收", "检验", "合格", "达标"
-            ],
-            "违约责任": [
-                "违约", "责任", "赔偿", "违约金", "罚金", "处罚", "损失", "补救"
-            ],
-            "争议解决": [
-                "争议", "纠纷", "解决", "诉讼", "仲裁", "管辖", "法院", "调解"
-            ],
-            "知识产权": [
-                "知识产权", "专利", "商标", "著作权", "版权", "许可", "转让", "归属"
-            ],
-            "保密条款": [
-                "保密", "秘密", "不得泄露", "保密义务", "保密期限", "涉密信息"
-            ],
-            "不可抗力": [
-                "不可抗力", "意外事件", "不可预见", "无法避免", "免责", "情势变更"
-            ],
-            "合同生效": [
-                "生效", "成立", "生效条件", "签署", "盖章", "批准", "备案"
-            ],
-            "合同终止": [
-                "终止", "解除", "终止条件", "解除权", "终止后果", "解除程序"
-            ]
-        }
+        self.contract_metrics = CONTRACT_METRICS
+        # 最近审查文档的中间结果 {内容哈希: (text, {方法名: 结果})}，同一文档的各项分析共用
+        # 规则分析与 LLM 步骤在不同线程中执行，读写需加锁
+        self._document_memos: OrderedDict = OrderedDict()
+        self._document_memo_lock = threading.Lock()
+        # 按内容哈希缓存规则分析与 LLM 分析结果，重复提交的合同直接复用
+        self._analysis_cache = SimpleCache(ttl=math.inf, max_size=ANALYSIS_CACHE_SIZE)
+        self._llm_analysis_cache = SimpleCache(ttl=math.inf, max_size=ANALYSIS_CACHE_SIZE)
+        # 渲染好的响应 (LLM 分析, 分析字典, 报告文本)，同一合同重复提交时不再重新序列化
+        self._report_cache = SimpleCache(ttl=math.inf, max_size=ANALYSIS_CACHE_SIZE)
+    
+    def initialize_contract_metrics(self) -> Mapping[str, Tuple[str, ...]]:
+        """Return the shared, read-only contract review metrics"""
+        return CONTRACT_METRICS
+    
+    def _document_memo(self, text: str) -> Dict[str, Any]:
+        """Return the memo dict for text, shared by every analysis of the same document content"""
+        with self._document_memo_lock:
+            # 先按对象身份查找，命中时不必对整篇文本做哈希
+            for key, (cached_text, memo) in reversed(self._document_memos.items()):
+                if cached_text is text:
+                    self._document_memos.move_to_end(key)
+                    return memo
+            key = _content_key(text)
+            cached = self._document_memos.get(key)
+            memo = cached[1] if cached is not None else {}
+            self._document_memos[key] = (text, memo)
+            self._document_memos.move_to_end(key)
+            if len(self._document_memos) > DOCUMENT_MEMO_SIZE:
+                self._document_memos.popitem(last=False)
+            return memo
+    
+    @_per_document
+    def _keyword_hits(self, text: str) -> Set[str]:
+        """Return the keywords present in text, scanning each document only once"""
+        return _scan_keywords(text)
+    
+    @_per_document
+    def _scan_lines(self, text: str) -> Dict[str, List[Tuple[int, str]]]:
+        """Collect the (offset, line) pairs matching each line category, once per document"""
+        return _scan_line_categories(text, self._keyword_hits(text))
+    
+    def _matching_lines(self, text: str, category: str) -> List[str]:
+        """Return stripped lines of text that match the given line category"""
+        return [line.strip() for _, line in self._scan_lines(text)[category]]
+    
+    def _mentions(self, text: str, terms: Tuple[str, ...]) -> bool:
+        """Whether text contains any of the given registered terms"""
+        return not self._keyword_hits(text).isdisjoint(terms)
     
     def process_text_message(self, message, context=None):
         """Process contract review requests"""
@@ -94,10 +534,42 @@ class ContractReviewAgent(BaseAgent):
             document_content = task_info.get("content", user_text)
             
             # Perform contract analysis
-            contract_analysis = self.perform_contract_analysis(document_content)
+            contract_analysis, response_text = self._render_analysis(
+                *self._analyze_contract(document_content)
+            )
+            
+            return {
+                "agent": "ContractReviewAgent",
+                "status": "success",
+                "analysis": contract_analysis,
+                "response_text": response_text,
+                "timestamp": self._get_current_timestamp()
+            }
+            
+        except Exception as e:
+            self.logger.error("Error in contract analysis: %s", e)
+            return {
+                "agent": "ContractReviewAgent",
+                "status": "error",
+                "message": f"合同分析过程中发生错误：{str(e)}",
+                "response_text": "合同分析过程中发生错误。",
+                "timestamp": self._get_current_timestamp()
+            }
+    
+    async def aprocess_text_message(self, message, context=None):
+        """Process contract review requests without blocking the event loop"""
+        user_text = message
+        self.logger.info("Processing contract review request")
+        
+        try:
+            # Extract task and content
+            task_info = self.extract_task_info(user_text)
+            document_content = task_info.get("content", user_text)
             
-            # Format response
-            response_text = self.format_contract_analysis(contract_analysis)
+            # 规则分析与 LLM 分析并发执行
+            contract_analysis, response_text = self._render_analysis(
+                *await self._aanalyze_contract(document_content)
+            )
             
             return {
                 "agent": "ContractReviewAgent",
@@ -108,7 +580,7 @@ class ContractReviewAgent(BaseAgent):
             }
             
         except Exception as e:
-            self.logger.error(f"Error in contract analysis: {str(e)}")
+            self.logger.error("Error in contract analysis: %s", e)
             return {
                 "agent": "ContractReviewAgent",
                 "status": "error",
@@ -117,39 +589,111 @@ class ContractReviewAgent(BaseAgent):
                 "timestamp": self._get_current_timestamp()
             }
     
-    def extract_task_info(self, text: str) -> Dict[str, Any]:
-        """Extract task information from the input text"""
-        lines = text.split('\n')
-        task_info = {"content": text}
-        
-        for line in lines:
-            if line.startswith("任务："):
-                task_info["task"] = line.replace("任务：", "").strip()
-            elif line.startswith("上下文："):
-                context_start = text.find("上下文：")
-                if context_start != -1:
-                    task_info["content"] = text[context_start + 4:].strip()
-                break
+    def _run_rule_analysis(self, document_text: str) -> ContractAnalysis:
+        """Run all rule-based analyses (only reads the text, safe to run in a worker thread)"""
+        return ContractAnalysis(
+            party_analysis=self.analyze_parties(document_text),
+            term_analysis=self.analyze_contract_terms(document_text),
+            obligation_analysis=self.analyze_rights_obligations(document_text),
+            risk_analysis=self.assess_contract_risks(document_text),
+            compliance_analysis=self.analyze_compliance(document_text),
+            enforceability_analysis=self.assess_enforceability(document_text),
+            recommendations=self.generate_contract_recommendations(document_text)
+        )
+    
+    def _lookup_cached_analysis(self, document_text: str) -> Tuple[str, Any, Any]:
+        """Return (content_key, cached rule analysis, cached LLM analysis)"""
+        content_key = _content_key(document_text)
         
-        return task_info
-    
-    def perform_contract_analysis(self, document_text: str) -> Dict[str, Any]:
-        """Perform comprehensive contract analysis"""
-        analysis = {
-            "party_analysis": self.analyze_parties(document_text),
-            "term_analysis": self.analyze_contract_terms(document_text),
-            "obligation_analysis": self.analyze_rights_obligations(document_text),
-            "risk_analysis": self.assess_contract_risks(document_text),
-            "compliance_analysis": self.analyze_compliance(document_text),
-            "enforceability_analysis": self.assess_enforceability(document_text),
-            "recommendations": self.generate_contract_recommendations(document_text)
-        }
+        analysis = self._analysis_cache.get(content_key)
+        if analysis is not None:
+            self.logger.info("✨ 合同规则分析缓存命中")
+        else:
+            self.logger.info("合同规则分析缓存未命中，开始分析")
+        
+        llm_analysis = self._llm_analysis_cache.get(content_key)
+        if llm_analysis is not None:
+            self.logger.info("✨ 合同LLM分析缓存命中")
+        
+        return content_key, analysis, llm_analysis
+    
+    def _render_analysis(self, content_key: str, analysis: ContractAnalysis) -> Tuple[Dict[str, Any], str]:
+        """Convert the analysis to a dict and format the report, reusing the last rendering of the same contract"""
+        cached = self._report_cache.get(content_key)
+        # LLM 分析结果可能被淘汰后重新生成，只有与缓存时一致才复用
+        # 返回的字典会被协调器与整合智能体继续处理，读写缓存时均复制，各请求互不影响
+        if cached is not None and cached[0] == analysis.detailed_analysis:
+            return copy.deepcopy(cached[1]), cached[2]
+        
+        analysis_dict = analysis.to_dict()
+        report = self.format_contract_analysis(analysis_dict)
+        self._report_cache.set(content_key, (analysis.detailed_analysis, copy.deepcopy(analysis_dict), report))
+        return analysis_dict, report
+    
+    def _needs_llm_analysis(self, document_text: str) -> bool:
+        """Cheap triage: skip the LLM for boilerplate contracts with no risk keywords (if enabled)"""
+        if not Config.PROCESSING_CONFIG.skip_llm_for_low_risk:
+            return True
+        if self._mentions(document_text, _RISK_TRIAGE_TERMS):
+            return True
+        self.logger.info("⏭️ 未命中风险关键词，跳过合同LLM分析")
+        return False
+    
+    def perform_contract_analysis(self, document_text: str) -> ContractAnalysis:
+        """Perform comprehensive contract analysis (cached by content hash)"""
+        return self._analyze_contract(document_text)[1]
+    
+    async def aperform_contract_analysis(self, document_text: str) -> ContractAnalysis:
+        """Async variant: rule analysis runs in a worker thread while the LLM analysis is pending"""
+        return (await self._aanalyze_contract(document_text))[1]
+    
+    def _analyze_contract(self, document_text: str) -> Tuple[str, ContractAnalysis]:
+        """Return (content_key, analysis) so the caller can reuse the hash when rendering"""
+        content_key, analysis, llm_analysis = self._lookup_cached_analysis(document_text)
+        
+        if analysis is None:
+            analysis = self._run_rule_analysis(document_text)
+            self._analysis_cache.set(content_key, analysis)
         
         # Get detailed analysis from LLM
-        llm_analysis = self.get_llm_contract_analysis(document_text)
-        analysis["detailed_analysis"] = llm_analysis
+        if llm_analysis is None:
+            if self._needs_llm_analysis(document_text):
+                llm_analysis = self.get_llm_contract_analysis(document_text)
+                self._llm_analysis_cache.set(content_key, llm_analysis)
+            else:
+                llm_analysis = LOW_RISK_ANALYSIS
         
-        return analysis
+        # 缓存的结果在多次请求间共享，返回新的顶层对象
+        return content_key, replace(analysis, detailed_analysis=llm_analysis)
+    
+    async def _aanalyze_contract(self, document_text: str) -> Tuple[str, ContractAnalysis]:
+        """Async variant of _analyze_contract"""
+        content_key, analysis, llm_analysis = self._lookup_cached_analysis(document_text)
+        
+        rules_task = (
+            asyncio.to_thread(self._run_rule_analysis, document_text)
+            if analysis is None else None
+        )
+        if llm_analysis is None and not self._needs_llm_analysis(document_text):
+            llm_analysis = LOW_RISK_ANALYSIS
+        llm_task = (
+            asyncio.to_thread(self.get_llm_contract_analysis, document_text)
+            if llm_analysis is None else None
+        )
+        
+        # 端到端耗时约为 max(LLM, 规则)，而不是两者之和
+        pending = [task for task in (rules_task, llm_task) if task is not None]
+        results = iter(await asyncio.gather(*pending))
+        
+        # 缓存只在事件循环线程中读写
+        if rules_task is not None:
+            analysis = next(results)
+            self._analysis_cache.set(content_key, analysis)
+        if llm_task is not None:
+            llm_analysis = next(results)
+            self._llm_analysis_cache.set(content_key, llm_analysis)
+        
+        return content_key, replace(analysis, detailed_analysis=llm_analysis)
     
     def analyze_parties(self, text: str) -> Dict[str, Any]:
         """Analyze contract parties and their qualifications"""
@@ -162,34 +706,21 @@ class ContractReviewAgent(BaseAgent):
         
         return party_analysis
     
-    def identify_parties(self, text: str) -> List[Dict[str, str]]:
+    def identify_parties(self, text: str) -> List[PartyRef]:
         """Identify contract parties"""
         parties = []
         
         # Identify primary parties
-        party_patterns = [
-            (r'甲方：(.*?)\n', '甲方'),
-            (r'乙方：(.*?)\n', '乙方'),
-            (r'丙方：(.*?)\n', '丙方'),
-            (r'甲方名称：(.*?)\n', '甲方'),
-            (r'乙方名称：(.*?)\n', '乙方'),
-            (r'甲方全称：(.*?)\n', '甲方'),
-            (r'乙方全称：(.*?)\n', '乙方')
-        ]
-        
-        for pattern, party_type in party_patterns:
-            match = re.search(pattern, text)
+        for pattern, party_type in _PARTY_PATTERNS:
+            match = pattern.search(text)
             if match:
-                parties.append({
-                    "type": party_type,
-                    "name": match.group(1).strip()
-                })
+                parties.append(PartyRef(party_type, match.group(1).strip()))
         
         # If no structured parties found, look for general mentions
         if not parties:
-            if re.search(r'甲方|乙方', text):
-                parties.append({"type": "甲方", "name": "未明确"})
-                parties.append({"type": "乙方", "name": "未明确"})
+            if self._mentions(text, _PARTY_MENTION_TERMS):
+                parties.append(PartyRef("甲方", "未明确"))
+                parties.append(PartyRef("乙方", "未明确"))
         
         return parties
     
@@ -202,13 +733,13 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check for qualification clauses
-        if re.search(r'资质|资格|许可|认证', text):
+        if self._mentions(text, _QUALIFICATION_TERMS):
             qualifications["has_qualification_clause"] = True
             
             # Extract specific qualifications
-            qual_keywords = ['营业执照', '经营许可证', '资质证书', '专业认证', '行业许可']
-            for qual in qual_keywords:
-                if qual in text:
+            hits = self._keyword_hits(text)
+            for qual in _QUALIFICATION_KEYWORDS:
+                if qual in hits:
                     qualifications["qualifications_specified"].append(qual)
         
         # Identify potential issues
@@ -225,15 +756,12 @@ class ContractReviewAgent(BaseAgent):
             "potential_issues": []
         }
         
-        if re.search(r'授权|委托|代表权|签字权', text):
+        if self._mentions(text, _AUTHORIZATION_TERMS):
             authorization["has_authorization_clause"] = True
             
-            if re.search(r'法定代表人|法人', text):
-                authorization["authorization_type"].append("法定代表人授权")
-            if re.search(r'授权委托书|委托书', text):
-                authorization["authorization_type"].append("授权委托书")
-            if re.search(r'公章|合同章', text):
-                authorization["authorization_type"].append("印章授权")
+            for terms, authorization_type in _AUTHORIZATION_TYPE_TERMS:
+                if self._mentions(text, terms):
+                    authorization["authorization_type"].append(authorization_type)
         
         if not authorization["has_authorization_clause"]:
             authorization["potential_issues"].append("未明确签约人的授权范围和权限")
@@ -248,10 +776,10 @@ class ContractReviewAgent(BaseAgent):
             "capacity_issues": []
         }
         
-        if re.search(r'公司|企业|法人|组织', text):
+        if self._mentions(text, _LEGAL_PERSON_TERMS):
             capacity["legal_person_check"] = "提及法人主体"
         
-        if re.search(r'个人|自然人', text):
+        if self._mentions(text, _NATURAL_PERSON_TERMS):
             capacity["natural_person_check"] = "提及自然人主体"
         
         if not capacity["legal_person_check"] and not capacity["natural_person_check"]:
@@ -281,8 +809,8 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check clarity of description
-        subject_keywords = ['标的', '标的物', '产品', '服务', '内容', '范围']
-        subject_mentions = sum(1 for kw in subject_keywords if kw in text)
+        hits = self._keyword_hits(text)
+        subject_mentions = sum(1 for kw in _SUBJECT_KEYWORDS if kw in hits)
         
         if subject_mentions >= 3:
             subject["description_clarity"] = "较明确"
@@ -290,19 +818,12 @@ class ContractReviewAgent(BaseAgent):
             subject["description_clarity"] = "基本明确"
         
         # Check if scope is defined
-        if re.search(r'范围|包括|包含|除外|不包括', text):
+        if self._mentions(text, _SCOPE_TERMS):
             subject["scope_defined"] = True
         
         # Extract specifications
-        spec_patterns = [
-            r'规格：(.*?)\n',
-            r'型号：(.*?)\n',
-            r'数量：(.*?)\n',
-            r'标准：(.*?)\n'
-        ]
-        
-        for pattern in spec_patterns:
-            matches = re.findall(pattern, text)
+        for pattern in _SPEC_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 subject["specifications"].append(match.strip())
         
@@ -323,20 +844,15 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Determine price type
-        if re.search(r'固定价|包干价|总价', text):
-            price_terms["price_determination"] = "固定价格"
-        elif re.search(r'单价|单位价格', text):
-            price_terms["price_determination"] = "单价形式"
-        elif re.search(r'成本加|可调价', text):
-            price_terms["price_determination"] = "可调价格"
+        for terms, price_type in _PRICE_TYPE_TERMS:
+            if self._mentions(text, terms):
+                price_terms["price_determination"] = price_type
+                break
         
         # Extract payment conditions
-        if re.search(r'验收合格后|验收通过后', text):
-            price_terms["payment_conditions"].append("验收合格后付款")
-        if re.search(r'发货后|交付后', text):
-            price_terms["payment_conditions"].append("交付后付款")
-        if re.search(r'见票后|收到发票后', text):
-            price_terms["payment_conditions"].append("收到发票后付款")
+        for terms, condition in _PAYMENT_CONDITION_TERMS:
+            if self._mentions(text, terms):
+                price_terms["payment_conditions"].append(condition)
         
         # Identify issues
         if price_terms["price_determination"] == "未明确":
@@ -347,28 +863,21 @@ class ContractReviewAgent(BaseAgent):
         
         return price_terms
     
-    def extract_payment_schedule(self, text: str) -> List[Dict[str, str]]:
+    def extract_payment_schedule(self, text: str) -> List[PaymentTerm]:
         """Extract payment schedule information"""
         schedule = []
-        lines = text.split('\n')
-        
-        payment_keywords = ['预付', '首付', '进度款', '尾款', '分期', '结算', '到期付款']
-        
-        for line in lines:
-            for keyword in payment_keywords:
-                if keyword in line:
-                    # Extract percentage if present
-                    percentage = None
-                    percent_match = re.search(r'(\d+)%', line)
-                    if percent_match:
-                        percentage = percent_match.group(1) + "%"
-                    
-                    schedule.append({
-                        "type": keyword,
-                        "description": line.strip(),
-                        "percentage": percentage
-                    })
-                    break
+        
+        for _, line in self._scan_lines(text)["payment"]:
+            # 按关键词清单顺序取第一个出现的关键词作为类型
+            keyword = next(kw for kw in _PAYMENT_KEYWORDS if kw in line)
+            
+            # Extract percentage if present
+            percentage = None
+            percent_match = _PERCENT_RE.search(line)
+            if percent_match:
+                percentage = percent_match.group(1) + "%"
+            
+            schedule.append(PaymentTerm(keyword, line.strip(), percentage))
         
         return schedule
     
@@ -380,19 +889,19 @@ class ContractReviewAgent(BaseAgent):
             "invoice_requirements": []
         }
         
-        if re.search(r'税|税率|发票|税额', text):
+        if self._mentions(text, _TAX_TERMS):
             tax_analysis["has_tax_clause"] = True
             
             # Determine tax bearing
-            if re.search(r'甲方承担|买方承担', text):
-                tax_analysis["tax_bearing"] = "甲方承担"
-            elif re.search(r'乙方承担|卖方承担', text):
-                tax_analysis["tax_bearing"] = "乙方承担"
+            for terms, bearing in _TAX_BEARING_TERMS:
+                if self._mentions(text, terms):
+                    tax_analysis["tax_bearing"] = bearing
+                    break
             
             # Check invoice requirements
-            if re.search(r'增值税专用发票', text):
+            if '增值税专用发票' in self._keyword_hits(text):
                 tax_analysis["invoice_requirements"].append("增值税专用发票")
-            elif re.search(r'普通发票', text):
+            elif '普通发票' in self._keyword_hits(text):
                 tax_analysis["invoice_requirements"].append("普通发票")
         
         return tax_analysis
@@ -407,15 +916,15 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check performance location
-        if re.search(r'地点|地址|场所', text):
-            location_match = re.search(r'地点：(.*?)\n', text)
+        if self._mentions(text, _LOCATION_TERMS):
+            location_match = _LOCATION_VALUE_RE.search(text)
             if location_match:
                 performance["performance_location"] = location_match.group(1).strip()
             else:
                 performance["performance_location"] = "已提及但未明确具体位置"
         
         # Check performance method
-        if re.search(r'方式|方法|途径', text):
+        if self._mentions(text, _METHOD_TERMS):
             performance["performance_method"] = "已约定履行方式"
         
         # Identify issues
@@ -424,22 +933,17 @@ class ContractReviewAgent(BaseAgent):
         
         return performance
     
-    def extract_obligations(self, text: str) -> List[Dict[str, str]]:
+    def extract_obligations(self, text: str) -> List[Obligation]:
         """Extract performance obligations for each party"""
         obligations = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if re.search(r'甲方应|甲方负责', line):
-                obligations.append({
-                    "party": "甲方",
-                    "obligation": line.strip()
-                })
-            elif re.search(r'乙方应|乙方负责', line):
-                obligations.append({
-                    "party": "乙方",
-                    "obligation": line.strip()
-                })
+        line_index = self._scan_lines(text)
+        
+        # 按行首偏移合并双方义务，同一行同时出现时归为甲方
+        party_lines = dict(line_index["party_b_obligation"])
+        party_a_lines = dict(line_index["party_a_obligation"])
+        party_lines.update(party_a_lines)
+        for start in sorted(party_lines):
+            obligations.append(Obligation("甲方" if start in party_a_lines else "乙方", party_lines[start].strip()))
         
         return obligations
     
@@ -454,7 +958,7 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check performance period
-        period_match = re.search(r'有效期(.*?)年|期限(.*?)年', text)
+        period_match = _PERIOD_RE.search(text)
         if period_match:
             time_terms["performance_period"] = f"{period_match.group(1) or period_match.group(2)}年"
         
@@ -466,48 +970,36 @@ class ContractReviewAgent(BaseAgent):
     
     def extract_effective_date(self, text: str) -> str:
         """Extract contract effective date"""
-        if re.search(r'生效日期|生效日', text):
-            date_match = re.search(r'生效日期：(.*?)\n', text)
+        if self._mentions(text, _EFFECTIVE_DATE_TERMS):
+            date_match = _EFFECTIVE_DATE_VALUE_RE.search(text)
             if date_match:
                 return date_match.group(1).strip()
-            elif re.search(r'自签署之日起生效', text):
+            elif '自签署之日起生效' in self._keyword_hits(text):
                 return "签署之日起生效"
-            elif re.search(r'自.*?之日起生效', text):
+            elif _CONDITIONAL_EFFECT_RE.search(text):
                 return "有条件生效"
         
         return "未明确"
     
     def extract_termination_date(self, text: str) -> str:
         """Extract contract termination date"""
-        if re.search(r'终止日期|到期日', text):
-            date_match = re.search(r'终止日期：(.*?)\n', text)
+        if self._mentions(text, _TERMINATION_DATE_TERMS):
+            date_match = _TERMINATION_DATE_VALUE_RE.search(text)
             if date_match:
                 return date_match.group(1).strip()
-            elif re.search(r'有效期届满自动终止', text):
+            elif '有效期届满自动终止' in self._keyword_hits(text):
                 return "有效期届满自动终止"
         
         return "未明确"
     
-    def extract_time_limits(self, text: str) -> List[Dict[str, str]]:
+    def extract_time_limits(self, text: str) -> List[TimeLimit]:
         """Extract key time limits"""
-        time_limits = []
-        
-        limit_patterns = [
-            (r'(\d+)日内.*?交付', '交付期限'),
-            (r'(\d+)日内.*?付款', '付款期限'),
-            (r'(\d+)日内.*?回复', '回复期限'),
-            (r'(\d+)日内.*?履行', '履行期限')
+        found = _scan_time_limits(text)
+        return [
+            TimeLimit(limit_type, f"{found[limit_type]}日内")
+            for _, limit_type in _TIME_LIMIT_TERMS
+            if limit_type in found
         ]
-        
-        for pattern, limit_type in limit_patterns:
-            match = re.search(pattern, text)
-            if match:
-                time_limits.append({
-                    "type": limit_type,
-                    "duration": f"{match.group(1)}日内"
-                })
-        
-        return time_limits
     
     def analyze_quality_terms(self, text: str) -> Dict[str, Any]:
         """Analyze quality and acceptance terms"""
@@ -529,36 +1021,15 @@ class ContractReviewAgent(BaseAgent):
     
     def extract_quality_standards(self, text: str) -> List[str]:
         """Extract quality standards"""
-        standards = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if re.search(r'质量标准|质量要求|应符合', line):
-                standards.append(line.strip())
-        
-        return standards
+        return self._matching_lines(text, "quality_standard")
     
     def extract_acceptance_criteria(self, text: str) -> List[str]:
         """Extract acceptance criteria"""
-        criteria = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if re.search(r'验收标准|验收条件|视为合格', line):
-                criteria.append(line.strip())
-        
-        return criteria
+        return self._matching_lines(text, "acceptance_criteria")
     
     def extract_inspection_procedures(self, text: str) -> List[str]:
         """Extract inspection procedures"""
-        procedures = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if re.search(r'检验|检查|验收程序|验收流程', line):
-                procedures.append(line.strip())
-        
-        return procedures
+        return self._matching_lines(text, "inspection")
     
     def analyze_rights_obligations(self, text: str) -> Dict[str, Any]:
         """Analyze rights and obligations balance"""
@@ -579,10 +1050,11 @@ class ContractReviewAgent(BaseAgent):
         
         return rights_obligations
     
+    @_per_document
     def assess_rights_balance(self, text: str) -> str:
         """Assess balance of rights between parties"""
-        party_a_rights = len(re.findall(r'甲方有权|甲方享有', text))
-        party_b_rights = len(re.findall(r'乙方有权|乙方享有', text))
+        party_a_rights = _count_terms(text, _PARTY_A_RIGHTS_TERMS)
+        party_b_rights = _count_terms(text, _PARTY_B_RIGHTS_TERMS)
         
         if party_a_rights == 0 and party_b_rights == 0:
             return "未明确约定权利"
@@ -591,10 +1063,11 @@ class ContractReviewAgent(BaseAgent):
         else:
             return "可能失衡"
     
+    @_per_document
     def assess_obligations_balance(self, text: str) -> str:
         """Assess balance of obligations between parties"""
-        party_a_obligations = len(re.findall(r'甲方应|甲方负责|甲方承担', text))
-        party_b_obligations = len(re.findall(r'乙方应|乙方负责|乙方承担', text))
+        party_a_obligations = _count_terms(text, _PARTY_A_DUTIES_TERMS)
+        party_b_obligations = _count_terms(text, _PARTY_B_DUTIES_TERMS)
         
         if party_a_obligations == 0 and party_b_obligations == 0:
             return "未明确约定义务"
@@ -612,23 +1085,21 @@ class ContractReviewAgent(BaseAgent):
             "infringement_liability": "未明确"
         }
         
-        if re.search(r'知识产权|专利|商标|著作权|版权', text):
+        if self._mentions(text, _IP_TERMS):
             ip_analysis["has_ip_clause"] = True
             
             # Check IP ownership
-            if re.search(r'归甲方所有|甲方享有', text):
-                ip_analysis["ip_ownership"] = "归甲方所有"
-            elif re.search(r'归乙方所有|乙方享有', text):
-                ip_analysis["ip_ownership"] = "归乙方所有"
-            elif re.search(r'共有|双方共有', text):
-                ip_analysis["ip_ownership"] = "双方共有"
+            for terms, ownership in _IP_OWNERSHIP_TERMS:
+                if self._mentions(text, terms):
+                    ip_analysis["ip_ownership"] = ownership
+                    break
             
             # Check license terms
-            if re.search(r'许可|授权|使用权', text):
+            if self._mentions(text, _LICENSE_TERMS):
                 ip_analysis["license_terms"].append("包含知识产权许可条款")
             
             # Check infringement liability
-            if re.search(r'侵权|责任|赔偿', text):
+            if self._mentions(text, _INFRINGEMENT_TERMS):
                 ip_analysis["infringement_liability"] = "已约定侵权责任"
         
         return ip_analysis
@@ -642,18 +1113,18 @@ class ContractReviewAgent(BaseAgent):
             "exceptions": []
         }
         
-        if re.search(r'保密|秘密|不得泄露', text):
+        if self._mentions(text, _CONFIDENTIALITY_TERMS):
             confidentiality["has_confidentiality_clause"] = True
             
             # Check duration
-            duration_match = re.search(r'保密期(.*?)年|保密义务(.*?)年', text)
+            duration_match = _CONFIDENTIALITY_DURATION_RE.search(text)
             if duration_match:
                 confidentiality["obligation_duration"] = f"{duration_match.group(1) or duration_match.group(2)}年"
-            elif re.search(r'永久保密', text):
+            elif '永久保密' in self._keyword_hits(text):
                 confidentiality["obligation_duration"] = "永久"
             
             # Check exceptions
-            if re.search(r'公开信息|已获知|法律要求', text):
+            if self._mentions(text, _CONFIDENTIALITY_EXCEPTION_TERMS):
                 confidentiality["exceptions"].append("存在保密义务例外情形")
         
         return confidentiality
@@ -700,29 +1171,15 @@ class ContractReviewAgent(BaseAgent):
     
     def extract_breach_definitions(self, text: str) -> List[str]:
         """Extract breach of contract definitions"""
-        breaches = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if re.search(r'违约|视为违约|构成违约', line):
-                breaches.append(line.strip())
-        
-        return breaches
+        return self._matching_lines(text, "breach")
     
     def extract_remedies(self, text: str) -> List[str]:
         """Extract breach remedies"""
         remedies = []
+        hits = self._keyword_hits(text)
         
-        remedy_keywords = {
-            '继续履行': ['继续履行', '强制履行'],
-            '采取补救措施': ['补救', '采取措施', '纠正'],
-            '赔偿损失': ['赔偿', '赔偿损失', '补偿'],
-            '支付违约金': ['违约金', '罚金', '支付罚款'],
-            '解除合同': ['解除合同', '终止合同']
-        }
-        
-        for remedy, keywords in remedy_keywords.items():
-            if any(keyword in text for keyword in keywords):
+        for remedy, keywords in _REMEDY_KEYWORDS.items():
+            if any(keyword in hits for keyword in keywords):
                 remedies.append(remedy)
         
         return remedies
@@ -735,11 +1192,11 @@ class ContractReviewAgent(BaseAgent):
             "reasonableness": "无法评估"
         }
         
-        if re.search(r'违约金|罚金|违约金额', text):
+        if self._mentions(text, _LIQUIDATED_DAMAGES_TERMS):
             damages["has_liquidated_clause"] = True
             
             # Extract amount or rate
-            amount_match = re.search(r'违约金(.*?)(元|%)', text)
+            amount_match = _LIQUIDATED_AMOUNT_RE.search(text)
             if amount_match:
                 damages["amount_or_rate"] = amount_match.group(0)
         
@@ -755,12 +1212,12 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check termination procedures
-        if re.search(r'通知|期限|书面形式', text) and re.search(r'终止|解除', text):
+        if self._mentions(text, _TERMINATION_NOTICE_TERMS) and self._mentions(text, _TERMINATION_TERMS):
             termination["termination_procedures"] = "已约定终止程序"
         
         # Check post-termination obligations
-        if re.search(r'终止后|解除后', text):
-            post_match = re.search(r'终止后(.*?)\n', text)
+        if self._mentions(text, _POST_TERMINATION_TERMS):
+            post_match = _POST_TERMINATION_VALUE_RE.search(text)
             if post_match:
                 termination["post_termination_obligations"].append(post_match.group(1).strip())
         
@@ -770,23 +1227,14 @@ class ContractReviewAgent(BaseAgent):
         
         return termination
     
-    def extract_termination_rights(self, text: str) -> List[Dict[str, str]]:
+    def extract_termination_rights(self, text: str) -> List[TerminationRight]:
         """Extract termination rights"""
         termination_rights = []
         
-        right_patterns = [
-            (r'甲方有权.*?解除|甲方有权.*?终止', '甲方'),
-            (r'乙方有权.*?解除|乙方有权.*?终止', '乙方'),
-            (r'双方均有权.*?解除|双方均有权.*?终止', '双方')
-        ]
-        
-        for pattern, party in right_patterns:
-            matches = re.findall(pattern, text)
+        for pattern, party in _TERMINATION_RIGHT_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
-                termination_rights.append({
-                    "party": party,
-                    "right": match.strip()
-                })
+                termination_rights.append(TerminationRight(party, match.strip()))
         
         return termination_rights
     
@@ -799,21 +1247,21 @@ class ContractReviewAgent(BaseAgent):
             "consequences": "未明确"
         }
         
-        if re.search(r'不可抗力', text):
+        hits = self._keyword_hits(text)
+        if '不可抗力' in hits:
             force_majeure["has_force_majeure_clause"] = True
             
             # Extract defined events
-            event_keywords = ['战争', '自然灾害', '地震', '洪水', '疫情', '政府行为', '罢工']
-            for event in event_keywords:
-                if event in text:
+            for event in _FORCE_MAJEURE_EVENTS:
+                if event in hits:
                     force_majeure["events_defined"].append(event)
             
             # Check notice requirements
-            if re.search(r'通知|期限|书面', text):
+            if self._mentions(text, _FORCE_MAJEURE_NOTICE_TERMS):
                 force_majeure["notice_requirements"] = "已约定通知要求"
             
             # Check consequences
-            if re.search(r'延期|中止|解除|免责', text):
+            if self._mentions(text, _FORCE_MAJEURE_CONSEQUENCE_TERMS):
                 force_majeure["consequences"] = "已约定不可抗力后果"
         
         return force_majeure
@@ -828,7 +1276,7 @@ class ContractReviewAgent(BaseAgent):
         }
         
         # Check ADR clauses
-        if re.search(r'协商|调解|和解', text):
+        if self._mentions(text, _ADR_TERMS):
             dispute_analysis["alternative_dispute_resolution"] = "已约定协商/调解"
         
         # Identify issues
@@ -842,28 +1290,31 @@ class ContractReviewAgent(BaseAgent):
     
     def extract_dispute_method(self, text: str) -> str:
         """Extract dispute resolution method"""
-        if re.search(r'诉讼', text) and re.search(r'仲裁', text):
+        hits = self._keyword_hits(text)
+        has_litigation = '诉讼' in hits
+        has_arbitration = '仲裁' in hits
+        if has_litigation and has_arbitration:
             return "同时约定了诉讼和仲裁（可能冲突）"
-        elif re.search(r'仲裁', text):
+        elif has_arbitration:
             return "仲裁"
-        elif re.search(r'诉讼', text):
+        elif has_litigation:
             return "诉讼"
         else:
             return "未明确"
     
     def extract_jurisdiction(self, text: str) -> str:
         """Extract jurisdiction information"""
-        if re.search(r'法院|管辖', text):
-            court_match = re.search(r'(.*?)法院.*?管辖', text)
-            if court_match:
-                return court_match.group(1) + "法院"
-            elif re.search(r'甲方所在地|乙方所在地', text):
+        if self._mentions(text, _COURT_TERMS):
+            court = _line_prefix(text, '法院', '管辖')
+            if court is not None:
+                return court + "法院"
+            elif self._mentions(text, _LOCAL_JURISDICTION_TERMS):
                 return "约定了一方所在地管辖"
         
-        if re.search(r'仲裁委员会', text):
-            arbitrator_match = re.search(r'(.*?)仲裁委员会', text)
-            if arbitrator_match:
-                return arbitrator_match.group(1) + "仲裁委员会"
+        if '仲裁委员会' in self._keyword_hits(text):
+            arbitrator = _line_prefix(text, '仲裁委员会')
+            if arbitrator is not None:
+                return arbitrator + "仲裁委员会"
         
         return "未明确"
     
@@ -886,10 +1337,10 @@ class ContractReviewAgent(BaseAgent):
         """Extract applicable laws and regulations"""
         laws = []
         
-        if re.search(r'适用法律|依据法律', text):
-            law_keywords = ['民法典', '合同法', '公司法', '招标投标法', '知识产权法']
-            for law in law_keywords:
-                if law in text:
+        if self._mentions(text, _APPLICABLE_LAW_TERMS):
+            hits = self._keyword_hits(text)
+            for law in _LAW_KEYWORDS:
+                if law in hits:
                     laws.append(law)
             
             if not laws:
@@ -905,13 +1356,13 @@ class ContractReviewAgent(BaseAgent):
             "reporting_requirements": "未提及"
         }
         
-        if re.search(r'行业规定|行业标准|监管要求', text):
+        if self._mentions(text, _INDUSTRY_REGULATION_TERMS):
             compliance["industry_regulations"] = "提及行业监管要求"
         
-        if re.search(r'审批|批准|备案', text):
+        if self._mentions(text, _APPROVAL_TERMS):
             compliance["government_approval"] = "提及需要政府审批"
         
-        if re.search(r'报告|报送|申报', text):
+        if self._mentions(text, _REPORTING_TERMS):
             compliance["reporting_requirements"] = "提及报告义务"
         
         return compliance
@@ -937,8 +1388,8 @@ class ContractReviewAgent(BaseAgent):
     
     def assess_clarity(self, text: str) -> str:
         """Assess contract language clarity"""
-        ambiguity_indicators = ['可能', '或许', '大概', '适当', '合理', '另行协商', '届时确定']
-        ambiguity_count = sum(1 for indicator in ambiguity_indicators if indicator in text)
+        hits = self._keyword_hits(text)
+        ambiguity_count = sum(1 for indicator in _AMBIGUITY_INDICATORS if indicator in hits)
         
         if ambiguity_count >= 5:
             return "存在较多模糊表述"
@@ -949,12 +1400,8 @@ class ContractReviewAgent(BaseAgent):
     
     def assess_completeness(self, text: str) -> str:
         """Assess contract completeness"""
-        key_terms = [
-            '标的', '价格', '履行', '期限', '质量', '违约责任', 
-            '争议解决', '生效', '当事人'
-        ]
-        
-        covered_terms = sum(1 for term in key_terms if term in text)
+        hits = self._keyword_hits(text)
+        covered_terms = sum(1 for term in _KEY_TERMS if term in hits)
         
         if covered_terms >= 8:
             return "较完整"
@@ -965,87 +1412,65 @@ class ContractReviewAgent(BaseAgent):
     
     def identify_ambiguities(self, text: str) -> List[str]:
         """Identify potential ambiguities"""
-        ambiguities = []
-        lines = text.split('\n')
-        
-        ambiguity_patterns = [
-            r'视情况而定',
-            r'双方另行协商',
-            r'届时确定',
-            r'合理的.*?',
-            r'适当的.*?',
-            r'必要时.*?'
-        ]
-        
-        for line in lines:
-            for pattern in ambiguity_patterns:
-                if re.search(pattern, line):
-                    ambiguities.append(line.strip())
-                    break
-        
-        return ambiguities
+        return self._matching_lines(text, "ambiguity")
     
-    def generate_contract_recommendations(self, text: str) -> List[Dict[str, str]]:
+    def generate_contract_recommendations(self, text: str) -> List[Recommendation]:
         """Generate contract improvement recommendations"""
         recommendations = []
+        hits = self._keyword_hits(text)
         
         # Analyze for key missing elements
-        if not re.search(r'违约责任', text):
-            recommendations.append({
-                "priority": "高",
-                "recommendation": "补充明确的违约责任条款，包括违约情形及相应救济措施"
-            })
-        
-        if not re.search(r'争议解决', text):
-            recommendations.append({
-                "priority": "高",
-                "recommendation": "明确约定争议解决方式（诉讼或仲裁）及管辖机构"
-            })
-        
-        if not re.search(r'生效日期', text):
-            recommendations.append({
-                "priority": "中",
-                "recommendation": "明确合同生效条件和日期"
-            })
-        
-        # Check for ambiguities
-        if len(self.identify_ambiguities(text)) > 3:
-            recommendations.append({
-                "priority": "中",
-                "recommendation": "修改模糊不清的表述，增强条款确定性"
-            })
-        
-        # Check rights and obligations balance
-        ro_analysis = self.analyze_rights_obligations(text)
-        if "可能失衡" in [ro_analysis["rights_balance"], ro_analysis["obligations_balance"]]:
-            recommendations.append({
-                "priority": "中",
-                "recommendation": "调整权利义务约定，确保双方权利义务基本对等"
-            })
+        if '违约责任' not in hits:
+            recommendations.append(Recommendation("高", "补充明确的违约责任条款，包括违约情形及相应救济措施"))
+        
+        if '争议解决' not in hits:
+            recommendations.append(Recommendation("高", "明确约定争议解决方式（诉讼或仲裁）及管辖机构"))
+        
+        if '生效日期' not in hits:
+            recommendations.append(Recommendation("中", "明确合同生效条件和日期"))
+        
+        # Check for ambiguities（只需要行数，不构建去空白后的行列表）
+        if len(self._scan_lines(text)["ambiguity"]) > 3:
+            recommendations.append(Recommendation("中", "修改模糊不清的表述，增强条款确定性"))
+        
+        # Check rights and obligations balance（只取两项平衡结论，不重跑知识产权/保密分析）
+        if "可能失衡" in (self.assess_rights_balance(text), self.assess_obligations_balance(text)):
+            recommendations.append(Recommendation("中", "调整权利义务约定，确保双方权利义务基本对等"))
         
         return recommendations
     
     def get_llm_contract_analysis(self, text: str) -> str:
         """Get detailed contract analysis from LLM"""
         # This would be implemented with actual LLM integration
-        prompt = f"""请对以下合同文本进行详细审查，重点关注合法性、公平性和可执行性：
-
-{text}
+        prompt = f"""请对文末的合同文本进行详细审查，重点关注合法性、公平性和可执行性。
 
 请从以下方面提供分析：
 1. 合同条款的完整性和明确性
 2. 双方权利义务的平衡性
 3. 潜在的法律风险和争议点
 4. 与相关法律法规的符合性
-5. 条款优化建议"""
+5. 条款优化建议
+
+合同文本：
+{text}"""
         
         # In a real implementation, this would call an LLM API
         # For this example, we return a placeholder
         return "基于提供的合同文本，LLM分析显示该合同整体结构完整，但存在若干需要完善的条款..."
     
+    def clear_cache(self):
+        """清空缓存（包括合同分析结果缓存）"""
+        super().clear_cache()
+        self._analysis_cache.clear()
+        self._llm_analysis_cache.clear()
+        self._report_cache.clear()
+    
     def format_contract_analysis(self, analysis: Dict[str, Any]) -> str:
         """Format contract analysis for human readability"""
         # Implementation would format the analysis into a readable report
+        # 标准库 json 指定 indent 时走纯 Python 编码器，orjson 快约一个数量级
+        if orjson is not None:
+            return "合同审查报告：\n\n" + orjson.dumps(analysis, option=orjson.OPT_INDENT_2).decode()
         return "合同审查报告：\n\n" + json.dumps(analysis, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
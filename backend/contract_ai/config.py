@@ -5,16 +5,27 @@ Optimized Configuration with Logging Setup
 
 import os
 import sys
+import queue
+import atexit
 import logging
-from dataclasses import dataclass
-from typing import Dict, Any
-from logging.handlers import RotatingFileHandler
-from langchain_deepseek import ChatDeepSeek
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
 # ==================== 日志配置 ====================
 
-@dataclass
+# 第三方库默认日志级别（只读，所有 LoggingConfig 实例共用同一份）
+_DEFAULT_THIRD_PARTY_LOG_LEVELS = MappingProxyType({
+    'watchfiles': 'WARNING',      # 🔧 关键：禁用watchfiles的INFO日志
+    'watchfiles.main': 'WARNING',
+    'uvicorn.access': 'WARNING',  # 可选：降低uvicorn访问日志
+    'httpx': 'WARNING',           # 可选：降低httpx日志
+    'httpcore': 'WARNING',        # 可选：降低httpcore日志
+})
+
+@dataclass(frozen=True, slots=True)
 class LoggingConfig:
     """日志配置类"""
     # 基础配置
@@ -27,23 +38,30 @@ class LoggingConfig:
     log_to_file: bool = False     # 🔧 关键：设为False避免触发文件监控
     log_file: str = "logs/contract_review.log"
     
+    # 是否记录函数级性能日志（performance_monitor），关闭后装饰器不再包装函数
+    enable_performance_log: bool = True
+    
     # 文件轮转配置
     max_bytes: int = 10 * 1024 * 1024  # 10MB
     backup_count: int = 5
     
-    # 第三方库日志级别（降低噪音）
-    third_party_log_levels: Dict[str, str] = None
-    
-    def __post_init__(self):
-        if self.third_party_log_levels is None:
-            self.third_party_log_levels = {
-                'watchfiles': 'WARNING',      # 🔧 关键：禁用watchfiles的INFO日志
-                'watchfiles.main': 'WARNING',
-                'uvicorn.access': 'WARNING',  # 可选：降低uvicorn访问日志
-                'httpx': 'WARNING',           # 可选：降低httpx日志
-                'httpcore': 'WARNING',        # 可选：降低httpcore日志
-            }
+    # 第三方库日志级别（降低噪音），需要自定义时传入新的字典
+    third_party_log_levels: Mapping[str, str] = field(
+        default_factory=lambda: _DEFAULT_THIRD_PARTY_LOG_LEVELS
+    )
     
+# 文件日志的后台写入线程（log_to_file=True 时创建）
+_log_listener: Optional[QueueListener] = None
+
+def _stop_log_listener():
+    """停止文件日志写入线程，写完队列中剩余的记录"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+atexit.register(_stop_log_listener)
+
 def setup_logging(config: LoggingConfig = None) -> logging.Logger:
     """
     配置日志系统
@@ -57,12 +75,16 @@ def setup_logging(config: LoggingConfig = None) -> logging.Logger:
     if config is None:
         config = LoggingConfig()
     
+    # 日志级别只解析一次，根记录器和各处理器共用
+    level = getattr(logging, config.level.upper())
+    
     # 获取根日志记录器
     root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, config.level.upper()))
+    root_logger.setLevel(level)
     
-    # 清除现有处理器（避免重复）
+    # 清除现有处理器（避免重复），并停止上一次配置的文件写入线程
     root_logger.handlers.clear()
+    _stop_log_listener()
     
     # 创建格式化器
     formatter = logging.Formatter(
@@ -73,7 +95,7 @@ def setup_logging(config: LoggingConfig = None) -> logging.Logger:
     # 1. 控制台处理器（推荐在开发环境使用）
     if config.log_to_console:
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(getattr(logging, config.level.upper()))
+        console_handler.setLevel(level)
         console_handler.setFormatter(formatter)
         root_logger.addHandler(console_handler)
     
@@ -91,31 +113,38 @@ def setup_logging(config: LoggingConfig = None) -> logging.Logger:
             backupCount=config.backup_count,
             encoding='utf-8'
         )
-        file_handler.setLevel(getattr(logging, config.level.upper()))
+        file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        
+        # 写文件和轮转 rename 放到后台线程，业务线程只做一次入队
+        global _log_listener
+        log_queue = queue.SimpleQueue()
+        _log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _log_listener.start()
+        root_logger.addHandler(QueueHandler(log_queue))
     
     # 3. 配置第三方库的日志级别（🔧 关键部分）
-    for logger_name, level in config.third_party_log_levels.items():
-        third_party_logger = logging.getLogger(logger_name)
-        third_party_logger.setLevel(getattr(logging, level.upper()))
+    # setLevel 直接接受级别名称，由 logging 内部查表
+    for logger_name, third_party_level in config.third_party_log_levels.items():
+        logging.getLogger(logger_name).setLevel(third_party_level.upper())
     
     # 记录配置信息
-    root_logger.info("="*60)
-    root_logger.info("日志系统配置完成")
-    root_logger.info(f"  日志级别: {config.level}")
-    root_logger.info(f"  控制台输出: {config.log_to_console}")
-    root_logger.info(f"  文件输出: {config.log_to_file}")
-    if config.log_to_file:
-        root_logger.info(f"  日志文件: {config.log_file}")
-    root_logger.info("="*60)
+    if root_logger.isEnabledFor(logging.INFO):
+        root_logger.info("=" * 60)
+        root_logger.info("日志系统配置完成")
+        root_logger.info("  日志级别: %s", config.level)
+        root_logger.info("  控制台输出: %s", config.log_to_console)
+        root_logger.info("  文件输出: %s", config.log_to_file)
+        if config.log_to_file:
+            root_logger.info("  日志文件: %s", config.log_file)
+        root_logger.info("=" * 60)
     
     return root_logger
 
 
 # ==================== LLM 配置 ====================
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LLMConfigData:
     """LLM配置数据类"""
     api_key: str
@@ -126,14 +155,25 @@ class LLMConfigData:
     timeout: int = 60
     max_retries: int = 3
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CacheConfig:
     """缓存配置"""
     enabled: bool = True
     ttl: int = 3600  # 缓存有效期（秒）
     max_size: int = 100  # 最大缓存条目数
+    # 语义缓存（精确缓存未命中时按向量相似度匹配，需要 sentence-transformers）
+    semantic_enabled: bool = False
+    semantic_threshold: float = 0.92  # 余弦相似度阈值
+    semantic_max_size: int = 1000  # 最大语义缓存条目数
+    semantic_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    # 缓存后端：memory（进程内）或 redis（多 worker 共享）
+    backend: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    key_prefix: str = "contractai:llm:"
+    # 缓存版本号：修改提示词模板时递增，使旧缓存条目失效而无需清空Redis
+    version: int = 1
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PerformanceConfig:
     """性能优化配置"""
     enable_parallel: bool = True  # 启用并行处理
@@ -141,8 +181,12 @@ class PerformanceConfig:
     chunk_size: int = 2000  # 🔧 修复：添加此字段
     enable_streaming: bool = True  # 启用流式处理
     batch_processing: bool = True  # 启用批处理
+    max_llm_concurrency: int = 8  # 进程内所有LLM请求的最大并发数（避免429限流）
+    total_timeout: int = 120  # 单次审查工作流（文档处理+并行分析+整合）的总时限（秒）
+    # 工作流检查点（每个节点后保存一次状态）；每次请求使用新的 thread_id、从不恢复，默认关闭
+    enable_checkpointing: bool = False
     
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ProcessingConfig:
     """处理配置"""
     max_text_length: int = 50000  # 最大文本长度
@@ -150,6 +194,8 @@ class ProcessingConfig:
     enable_preprocessing: bool = True  # 启用预处理
     enable_text_compression: bool = True  # 启用文本压缩
     chunk_size: int = 2000  # 🔧 修复：添加此字段
+    # 规则预检未命中任何风险关键词（违约/争议/不可抗力）时跳过合同的 LLM 详细分析
+    skip_llm_for_low_risk: bool = False
     
 class Config:
     """主配置类 - 合同审查系统"""
@@ -177,7 +223,9 @@ class Config:
     CACHE_CONFIG = CacheConfig(
         enabled=True,
         ttl=3600,
-        max_size=100
+        max_size=100,
+        backend=os.environ.get('CACHE_BACKEND', 'memory'),
+        redis_url=os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     )
     
     # 性能配置
@@ -186,7 +234,10 @@ class Config:
         max_workers=4,
         chunk_size=2000,
         enable_streaming=True,
-        batch_processing=True
+        batch_processing=True,
+        max_llm_concurrency=8,
+        total_timeout=120,
+        enable_checkpointing=False
     )
     
     # 处理配置
@@ -209,23 +260,36 @@ class Config:
         "integration": 7007
     }
     
+    # 各 Agent 的 URL 在类创建时生成一次
+    AGENT_URLS = MappingProxyType({
+        name: f"http://localhost:{port}" for name, port in AGENT_PORTS.items()
+    })
+    
     @classmethod
     def get_agent_url(cls, agent_name: str) -> str:
         """获取Agent URL"""
-        port = cls.AGENT_PORTS.get(agent_name, 7000)
-        return f"http://localhost:{port}"
+        return cls.AGENT_URLS.get(agent_name, "http://localhost:7000")
     
     @classmethod
     def initialize(cls):
-        """初始化配置（包括日志系统）"""
+        """初始化配置（包括日志系统），重复调用时不再重建处理器"""
+        global _logging_initialized
+        if _logging_initialized:
+            return logging.getLogger()
+        
         # 配置日志系统
         logger = setup_logging(cls.LOGGING_CONFIG)
+        _logging_initialized = True
         return logger
 
 
 # ==================== 自动初始化 ====================
-# 当导入config时自动初始化日志系统
-logger = Config.initialize()
+# 当导入config时自动初始化日志系统（设置 CONTRACTAI_AUTO_LOG=0 可由调用方自行配置日志）
+_logging_initialized = False
+if os.environ.get('CONTRACTAI_AUTO_LOG', '1') == '1':
+    logger = Config.initialize()
+else:
+    logger = logging.getLogger()
 
 
 # ==================== 使用示例 ====================
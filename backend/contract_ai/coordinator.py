@@ -2,28 +2,41 @@
 优化后的协调器
 Optimized Coordinator with Improved Parallel Processing and Data Flow
 """
+import copy
 import json
 import asyncio
-import uuid
 import logging
+import secrets
+import threading
 import time
-from typing import Dict, List, Any, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bisect import bisect_right
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from functools import cache
 from dataclasses import dataclass
 
 from langchain_core.messages import HumanMessage
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 
-from base_agent import BaseAgent
-from config import Config
+from contract_ai.base_agent import BaseAgent, LLMConcurrencyLimiter, PERFORMANCE_HISTORY_SIZE
+from contract_ai.config import Config
+
+# orjson 的缩进输出与 json.dumps(ensure_ascii=False, indent=2) 一致，未安装时回退到标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 简化的智能体导入（实际使用时需要优化版本）
 try:
-    from legal_agent import LegalAgent
-    from business_agent import ContractReviewAgent  
-    from document_agent import DocumentProcessingAgent
-    from integration_agent import IntegrationAgent
+    from contract_ai.legal_agent import LegalAgent
+    from contract_ai.business_agent import ContractReviewAgent  
+    from contract_ai.document_agent import DocumentProcessingAgent
+    from contract_ai.integration_agent import IntegrationAgent
 except ImportError:
     # 如果原始智能体不可用，使用占位符
     LegalAgent = None
@@ -31,7 +44,58 @@ except ImportError:
     DocumentProcessingAgent = None
     IntegrationAgent = None
 
-@dataclass
+# 工作流使用的专业智能体（首次使用时才实例化）
+_AGENT_CLASSES = {
+    "document": DocumentProcessingAgent,
+    "legal": LegalAgent,
+    "business": ContractReviewAgent,
+    "integration": IntegrationAgent
+}
+
+# 智能体结果中传给下游的关键字段
+_KEY_FIELDS = ("key_points", "summary", "risk_areas", "important_clauses", "analysis")
+
+# 按输入长度选择处理策略（长文档由文档智能体分块并发提取，不做预先压缩）
+_PLAN_THRESHOLDS = (1000, 10000)
+_PLAN_STRATEGIES = ("快速处理", "标准处理", "分块处理")
+
+# 流式审查时各节点完成后推送的状态字段（不推送完整的解析结果和原文）
+_STREAM_FIELDS = {
+    "document": ("document_summary",),
+    "parallel": ("legal_summary", "business_summary"),
+    "integrate": ("final_response",)
+}
+
+# 当前工作流的截止时间（time.monotonic），由入口设置，节点内的智能体调用共用同一时限
+_workflow_deadline: ContextVar[Optional[float]] = ContextVar("workflow_deadline", default=None)
+
+def _remaining_time() -> float:
+    """距工作流截止时间的剩余秒数（未设置截止时间时为总时限）"""
+    deadline = _workflow_deadline.get()
+    if deadline is None:
+        return Config.PERFORMANCE_CONFIG.total_timeout
+    return deadline - time.monotonic()
+
+def _dumps(obj: Any, indent: bool = False) -> str:
+    """序列化为 JSON 字符串（保留中文），优先使用 orjson"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+def _preview(value: Any, limit: int) -> str:
+    """取值的前 limit 个字符作为预览"""
+    if isinstance(value, str):
+        return value[:limit]
+    if orjson is not None:
+        # 序列化比 str(dict) 快；UTF-8 每个字符最多 4 字节，先截取字节再解码，不解码整个结果
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)[:limit * 4].decode(errors="ignore")[:limit]
+        except TypeError:
+            pass
+    return str(value)[:limit]
+
+@dataclass(slots=True)
 class WorkflowMetrics:
     """工作流性能指标"""
     total_time: float = 0.0
@@ -41,10 +105,68 @@ class WorkflowMetrics:
     cache_hits: int = 0
     total_tokens: int = 0
 
+# 汇总统计的阶段耗时字段
+_WORKFLOW_STAGES = ("total_time", "document_time", "parallel_time", "integration_time")
+
+def _summarize_times(values: List[float]) -> Dict[str, float]:
+    """耗时序列的平均值、P95 和最大值"""
+    ordered = sorted(values)
+    return {
+        "avg": sum(ordered) / len(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1]
+    }
+
+def _coordinator_node(method_name: str):
+    """工作流节点：从运行配置中取出协调器实例，调用其同名方法"""
+    async def node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        coordinator = config["configurable"]["coordinator"]
+        return await getattr(coordinator, method_name)(state)
+    
+    node.__name__ = method_name
+    return node
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """同步入口共用的事件循环（首次使用时在守护线程中启动，之后所有调用复用）"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="coordinator-loop", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
+
+def _build_workflow_graph(checkpointer: Optional[BaseCheckpointSaver]):
+    """构建优化的工作流图"""
+    workflow = StateGraph(dict)
+    
+    # 定义节点
+    workflow.add_node("document", _coordinator_node("run_document_agent_optimized"))
+    workflow.add_node("parallel", _coordinator_node("run_parallel_agents_optimized"))
+    workflow.add_node("integrate", _coordinator_node("run_integration_agent_optimized"))
+    
+    # 定义流程
+    workflow.set_entry_point("document")
+    workflow.add_edge("document", "parallel")
+    workflow.add_edge("parallel", "integrate")
+    workflow.set_finish_point("integrate")
+    
+    return workflow.compile(checkpointer=checkpointer)
+
+@cache
+def _compiled_workflow_graph():
+    """默认的工作流图（每个进程只编译一次，所有协调器实例共用）"""
+    # 检查点只写不读时关闭，省去每个节点后对整份状态的序列化
+    checkpointer = MemorySaver() if Config.PERFORMANCE_CONFIG.enable_checkpointing else None
+    return _build_workflow_graph(checkpointer)
+
 class ContractCoordinator(BaseAgent):
     """优化后的协调器"""
     
-    def __init__(self):
+    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None):
         system_prompt = """你是合同审查系统的主协调器。你的职责是：
 1. 接收用户的合同审查请求
 2. 高效地将任务分配给专业智能体团队
@@ -60,191 +182,158 @@ class ContractCoordinator(BaseAgent):
         
         super().__init__("OptimizedCoordinator", system_prompt)
         
-        # 初始化专业智能体
-        self.agents = self._initialize_agents()
+        # 专业智能体在首次使用时创建（见 _get_agent）
+        self.agents: Dict[str, Any] = {}
+        # 每种智能体一把锁：并发的首次请求只创建一个实例（锁在工作线程中获取，不绑定事件循环）
+        self._agent_locks = {name: threading.Lock() for name in _AGENT_CLASSES}
         
-        # 工作流配置
-        self.memory = MemorySaver()
-        self.graph = self._build_workflow_graph()
+        # 工作流配置（编译后的图在进程内共用，节点通过运行配置找到本实例）
+        # 需要保留检查点用于排查时可传入持久化存储（如 SqliteSaver），此时单独编译一份
+        if checkpointer is None:
+            self.graph = _compiled_workflow_graph()
+        else:
+            self.graph = _build_workflow_graph(checkpointer)
+        
+        # 最近完成的工作流指标（用于 get_performance_stats 汇总）
+        self._workflow_history = deque(maxlen=PERFORMANCE_HISTORY_SIZE)
         
-        # 性能配置
-        self.executor = ThreadPoolExecutor(
-            max_workers=Config.PERFORMANCE_CONFIG.max_workers
-        )
+        # 限制同时运行的分析智能体调用数（所有请求共用）
+        # 协调器同时在 uvicorn 与后台事件循环中使用，不能用绑定单个事件循环的 asyncio.Semaphore
+        self._agent_limiter = LLMConcurrencyLimiter(Config.PERFORMANCE_CONFIG.max_workers)
         
         self.logger.info("✅ 优化协调器初始化完成")
     
-    def _initialize_agents(self) -> Dict[str, Any]:
-        """初始化智能体（延迟加载）"""
-        agents = {}
-        
-        # 使用延迟初始化，避免启动时的性能开销
-        agent_classes = {
-            "document": DocumentProcessingAgent,
-            "legal": LegalAgent,
-            "business": ContractReviewAgent,
-            "integration": IntegrationAgent
-        }
-        
-        for name, agent_class in agent_classes.items():
-            if agent_class is not None:
-                try:
-                    agents[name] = agent_class()
-                    self.logger.info(f"✅ {name} 智能体加载成功")
-                except Exception as e:
-                    self.logger.warning(f"⚠️ {name} 智能体加载失败: {e}")
-                    agents[name] = None
-            else:
-                agents[name] = None
-        
-        return agents
+    def _create_agent(self, name: str) -> Any:
+        """创建智能体，不可用或加载失败时返回 None"""
+        agent_class = _AGENT_CLASSES.get(name)
+        if agent_class is None:
+            return None
+        try:
+            agent = agent_class()
+            self.logger.info("✅ %s 智能体加载成功", name)
+            return agent
+        except Exception as e:
+            self.logger.warning("⚠️ %s 智能体加载失败: %s", name, e)
+            return None
     
-    def _build_workflow_graph(self):
-        """构建优化的工作流图"""
-        workflow = StateGraph(dict)
-        
-        # 定义节点
-        workflow.add_node("plan", self.plan_workflow)
-        workflow.add_node("document", self.run_document_agent_optimized)
-        workflow.add_node("parallel", self.run_parallel_agents_optimized)
-        workflow.add_node("integrate", self.run_integration_agent_optimized)
-        
-        # 定义流程
-        workflow.set_entry_point("plan")
-        workflow.add_edge("plan", "document")
-        workflow.add_edge("document", "parallel")
-        workflow.add_edge("parallel", "integrate")
-        workflow.set_finish_point("integrate")
-        
-        return workflow.compile(checkpointer=self.memory)
+    def _load_agent(self, name: str):
+        """创建并登记智能体（已有其他线程在创建时等待其完成）"""
+        with self._agent_locks[name]:
+            if name not in self.agents:
+                self.agents[name] = self._create_agent(name)
     
-    def plan_workflow(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """快速规划工作流（无需LLM调用）"""
-        start_time = time.time()
-        
-        user_input = state.get("user_input", "")
-        input_length = len(user_input)
-        
-        self.logger.info(f"🔄 [STEP 1] 规划工作流")
-        self.logger.info(f"  输入长度: {input_length:,} 字符")
-        
-        # 基于输入长度选择处理策略
-        if input_length < 1000:
-            strategy = "快速处理"
-            use_compression = False
-        elif input_length < 10000:
-            strategy = "标准处理"
-            use_compression = False
-        else:
-            strategy = "分块处理"
-            use_compression = True
-        
-        elapsed = time.time() - start_time
-        self.logger.info(f"✅ 规划完成: {strategy} (耗时: {elapsed:.2f}秒)")
-        
+    async def _get_agent(self, name: str) -> Any:
+        """获取智能体（延迟加载：首次使用时在线程中创建，不阻塞事件循环）"""
+        if name not in _AGENT_CLASSES:
+            return None
+        if name not in self.agents:
+            await asyncio.to_thread(self._load_agent, name)
+        return self.agents[name]
+    
+    def agent_status(self) -> Dict[str, Dict[str, bool]]:
+        """各专业智能体的状态：available 表示可以创建，loaded 表示实例已创建"""
         return {
-            **state,
-            "workflow_plan": strategy,
-            "use_compression": use_compression,
-            "metrics": WorkflowMetrics(),
-            "error": None
+            name: {
+                "available": agent_class is not None and self.agents.get(name, agent_class) is not None,
+                "loaded": self.agents.get(name) is not None
+            }
+            for name, agent_class in _AGENT_CLASSES.items()
         }
     
-    def run_document_agent_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def run_document_agent_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """优化的文档处理"""
         start_time = time.time()
-        self.logger.info("🔄 [STEP 2] 文档处理")
+        self.logger.info("🔄 [STEP 1] 文档处理")
         
         try:
-            document_agent = self.agents.get("document")
+            document_agent = await self._get_agent("document")
             if not document_agent:
                 raise ValueError("文档处理智能体不可用")
             
-            # 准备输入
+            # 准备输入（完整原文：文档智能体内部按段落分块并发提取，压缩会丢掉中间章节）
             user_input = state["user_input"]
-            use_compression = state.get("use_compression", False)
-            
-            # 如果需要压缩，预处理文本
-            if use_compression:
-                user_input = self._compress_text(user_input)
-                self.logger.info(f"  📦 已压缩输入文本")
+            metrics = state.get("metrics", WorkflowMetrics())
             
-            # 调用文档处理
-            result = document_agent.invoke({
-                "text": user_input,
-                "context": ""
-            })
+            # 调用文档处理（同一份文档重复审查时直接复用缓存的解析结果）
+            result = await self._invoke_agent_cached("document", document_agent, user_input, metrics)
             
-            # 提取关键信息（减少数据传输）
-            context_summary = self._extract_key_info(result)
+            # 提取关键信息（减少数据传输）：字段字典留给整合阶段，序列化结果拼接到分析输入
+            document_summary = self._extract_key_fields(result)
+            context_summary = self._serialize_key_fields(document_summary)
             
             elapsed = time.time() - start_time
-            self.logger.info(f"✅ 文档处理完成 (耗时: {elapsed:.2f}秒)")
+            self.logger.info("✅ 文档处理完成 (耗时: %.2f秒)", elapsed)
             
             # 更新性能指标
-            metrics = state.get("metrics", WorkflowMetrics())
             metrics.document_time = elapsed
             
-            return {
-                **state,
+            # 各节点原地更新状态并返回同一个字典，不再逐节点复制整份状态
+            state.update({
                 "document_result": result,
+                "document_summary": document_summary,
                 "context_summary": context_summary,
                 "metrics": metrics,
                 "error": None
-            }
+            })
+            return state
             
         except Exception as e:
             elapsed = time.time() - start_time
-            self.logger.error(f"❌ 文档处理失败 (耗时: {elapsed:.2f}秒): {e}")
-            return {
-                **state,
+            self.logger.error("❌ 文档处理失败 (耗时: %.2f秒): %s", elapsed, e)
+            state.update({
                 "document_result": {"status": "error", "message": str(e)},
                 "context_summary": "",
                 "error": str(e)
-            }
+            })
+            return state
     
-    def _extract_key_info(self, result: Any) -> str:
-        """提取关键信息，减少数据传输量"""
+    def _extract_key_fields(self, result: Any) -> Any:
+        """提取关键信息，减少数据传输量（字典结果保持为字典，不做序列化）"""
         try:
             if isinstance(result, dict):
                 # 只提取关键字段
-                key_fields = ["key_points", "summary", "risk_areas", "important_clauses", "analysis"]
-                extracted = {}
-                
-                for field in key_fields:
-                    if field in result:
-                        extracted[field] = result[field]
+                extracted = {field: result[field] for field in _KEY_FIELDS if field in result}
                 
-                if "response_text" in result:
+                text = result.get("response_text")
+                if text is not None:
                     # 只保留前1000字符
-                    text = result["response_text"]
-                    extracted["summary"] = text[:1000] if len(text) > 1000 else text
+                    extracted["summary"] = text[:1000]
                 
-                return json.dumps(extracted, ensure_ascii=False)
+                return extracted
             
             elif isinstance(result, str):
                 # 截断长文本
-                return result[:1000] if len(result) > 1000 else result
+                return result[:1000]
             
             return str(result)[:500]
             
         except Exception as e:
-            self.logger.warning(f"⚠️ 提取关键信息失败: {e}")
+            self.logger.warning("⚠️ 提取关键信息失败: %s", e)
             return ""
     
-    def run_parallel_agents_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def _serialize_key_fields(self, extracted: Any) -> str:
+        """将提取的关键信息序列化为字符串（用于拼接到智能体的输入文本中）"""
+        if not isinstance(extracted, dict):
+            return extracted
+        try:
+            return _dumps(extracted)
+        except Exception as e:
+            self.logger.warning("⚠️ 提取关键信息失败: %s", e)
+            return ""
+    
+    async def run_parallel_agents_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """优化的并行分析"""
         start_time = time.time()
-        self.logger.info("🔄 [STEP 3] 并行分析 (法律 + 商业)")
+        self.logger.info("🔄 [STEP 2] 并行分析 (法律 + 商业)")
         
         # 检查上游错误
         if state.get("error"):
             self.logger.warning("⚠️ 检测到上游错误，跳过分析")
-            return {
-                **state,
+            state.update({
                 "legal_result": "因上游错误跳过",
                 "business_result": "因上游错误跳过"
-            }
+            })
+            return state
         
         try:
             # 准备共享输入（使用压缩后的上下文）
@@ -254,101 +343,132 @@ class ContractCoordinator(BaseAgent):
             # 组合输入：让智能体既能看到结构化摘要，也能查阅原文
             combined_input = f"文档摘要：\n{context_summary}\n\n原文内容：\n{raw_input}"
             
+            metrics = state.get("metrics", WorkflowMetrics())
+            
             # 并行执行
-            legal_agent = self.agents.get("legal")
-            business_agent = self.agents.get("business")
+            legal_agent, business_agent = await asyncio.gather(
+                self._get_agent("legal"), self._get_agent("business")
+            )
             
             if not legal_agent or not business_agent:
                 raise ValueError("分析智能体不可用")
             
-            # 使用线程池并行执行
-            futures = {
-                self.executor.submit(
-                    self._safe_agent_invoke, 
-                    legal_agent, 
-                    combined_input,
-                    "法律分析"
-                ): "legal",
-                self.executor.submit(
-                    self._safe_agent_invoke,
-                    business_agent,
-                    combined_input,
-                    "商业分析"
-                ): "business"
-            }
+            # 在事件循环中并发执行，单个智能体失败不影响另一个
+            agent_types = ("legal", "business")
+            outcomes = await asyncio.gather(
+                self._invoke_agent_cached("legal", legal_agent, combined_input, metrics),
+                self._invoke_agent_cached("business", business_agent, combined_input, metrics),
+                return_exceptions=True
+            )
             
             results = {}
-            for future in as_completed(futures):
-                agent_type = futures[future]
-                try:
-                    result = future.result(timeout=60)
-                    results[agent_type] = result
-                    self.logger.info(f"  ✅ {agent_type} 分析完成")
-                except Exception as e:
-                    self.logger.error(f"  ❌ {agent_type} 分析失败: {e}")
-                    results[agent_type] = f"Error: {str(e)}"
+            for agent_type, outcome in zip(agent_types, outcomes):
+                if isinstance(outcome, Exception):
+                    self.logger.error("  ❌ %s 分析失败: %r", agent_type, outcome)
+                    results[agent_type] = f"Error: {str(outcome)}"
+                else:
+                    results[agent_type] = outcome
+                    self.logger.info("  ✅ %s 分析完成", agent_type)
             
             elapsed = time.time() - start_time
-            self.logger.info(f"✅ 并行分析完成 (耗时: {elapsed:.2f}秒)")
+            self.logger.info("✅ 并行分析完成 (耗时: %.2f秒)", elapsed)
             
             # 更新性能指标
-            metrics = state.get("metrics", WorkflowMetrics())
             metrics.parallel_time = elapsed
             
-            return {
-                **state,
+            state.update({
                 "legal_result": results.get("legal", "未执行"),
                 "business_result": results.get("business", "未执行"),
+                # 摘要在此提取一次，整合阶段直接复用（进程内传递字典，无需序列化）
+                "legal_summary": self._extract_key_fields(results.get("legal", "未执行")),
+                "business_summary": self._extract_key_fields(results.get("business", "未执行")),
                 "metrics": metrics
-            }
+            })
+            return state
             
         except Exception as e:
             elapsed = time.time() - start_time
-            self.logger.error(f"❌ 并行分析失败 (耗时: {elapsed:.2f}秒): {e}")
-            return {
-                **state,
+            self.logger.error("❌ 并行分析失败 (耗时: %.2f秒): %s", elapsed, e)
+            state.update({
                 "legal_result": f"Error: {str(e)}",
                 "business_result": f"Error: {str(e)}"
-            }
+            })
+            return state
     
-    def _safe_agent_invoke(self, agent, text: str, agent_name: str) -> Any:
-        """安全的智能体调用（带超时和异常处理）"""
+    async def _invoke_agent_cached(
+        self, agent_type: str, agent: BaseAgent, text: str, metrics: WorkflowMetrics
+    ) -> Any:
+        """调用分析智能体，相同输入直接复用已缓存的成功结果（读写缓存时均复制，各请求互不影响）"""
+        # 键中包含智能体名称、模型和提示词签名，加前缀与智能体自身的LLM缓存区分
+        cache_key = f"agent:{agent._generate_cache_key(text)}" if self.cache else None
+        if cache_key is not None:
+            cached = await self._acache_get(cache_key)
+            if cached is not None:
+                metrics.cache_hits += 1
+                self.logger.info("  ✨ %s 分析结果缓存命中", agent_type)
+                return copy.deepcopy(cached)
+        
+        await self._agent_limiter.acquire_async()
         try:
-            result = agent.invoke({"text": text})
-            return result
-        except Exception as e:
-            self.logger.error(f"❌ {agent_name} 调用失败: {e}")
+            remaining = _remaining_time()
+            if remaining <= 0:
+                raise TimeoutError("已超过审查总时限，跳过分析")
+            task = asyncio.ensure_future(agent.ainvoke({"text": text}))
+        except BaseException:
+            self._agent_limiter.release()
             raise
+        # 名额在调用真正结束时才归还：超时后 to_thread 中的分析仍在运行，提前归还会让实际运行数超过上限
+        task.add_done_callback(self._release_agent_slot)
+        done, _ = await asyncio.wait({task}, timeout=remaining)
+        if not done:
+            raise TimeoutError("审查总时限内未完成分析")
+        result = task.result()
+        
+        # 只缓存成功的结果，出错的请求下次重新分析
+        if cache_key is not None and isinstance(result, dict) and result.get("status") == "success":
+            await self._acache_set(cache_key, copy.deepcopy(result))
+        return result
     
-    def run_integration_agent_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def _release_agent_slot(self, task: "asyncio.Future"):
+        """分析调用结束后归还名额"""
+        self._agent_limiter.release()
+        # 超时后被放弃的调用由这里取走异常，避免事件循环报告未获取的异常
+        if not task.cancelled():
+            task.exception()
+    
+    async def run_integration_agent_optimized(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """优化的结果整合"""
         start_time = time.time()
-        self.logger.info("🔄 [STEP 4] 整合结果")
+        self.logger.info("🔄 [STEP 3] 整合结果")
         
         try:
-            integration_agent = self.agents.get("integration")
+            integration_agent = await self._get_agent("integration")
             if not integration_agent:
                 # 如果整合智能体不可用，使用简单整合
                 return self._simple_integration(state)
             
+            if _remaining_time() <= 0:
+                self.logger.warning("⚠️ 已超过审查总时限，使用简单整合")
+                return self._simple_integration(state)
+            
             # 收集结果（只传递必要信息）
             results = {
-                "document": self._extract_key_info(state.get("document_result")),
-                "legal": self._extract_key_info(state.get("legal_result")),
-                "business": self._extract_key_info(state.get("business_result"))
+                "document": state.get("document_summary") or self._extract_key_fields(state.get("document_result")),
+                "legal": state.get("legal_summary") or self._extract_key_fields(state.get("legal_result")),
+                "business": state.get("business_summary") or self._extract_key_fields(state.get("business_result"))
             }
             
             # 调用整合智能体
-            final_result = integration_agent.invoke({"results": results})
+            final_result = await integration_agent.ainvoke({"results": results})
             
             # 格式化输出
             if isinstance(final_result, dict):
-                final_response = json.dumps(final_result, ensure_ascii=False, indent=2)
+                final_response = _dumps(final_result, indent=True)
             else:
                 final_response = str(final_result)
             
             elapsed = time.time() - start_time
-            self.logger.info(f"✅ 整合完成 (耗时: {elapsed:.2f}秒)")
+            self.logger.info("✅ 整合完成 (耗时: %.2f秒)", elapsed)
             
             # 更新性能指标
             metrics = state.get("metrics", WorkflowMetrics())
@@ -360,18 +480,19 @@ class ContractCoordinator(BaseAgent):
             )
             
             # 记录性能报告
+            self._workflow_history.append(metrics)
             self._log_performance_report(metrics)
             
-            return {
-                **state,
+            state.update({
                 "final_response": final_response,
                 "metrics": metrics,
                 "error": None
-            }
+            })
+            return state
             
         except Exception as e:
             elapsed = time.time() - start_time
-            self.logger.error(f"❌ 整合失败 (耗时: {elapsed:.2f}秒): {e}")
+            self.logger.error("❌ 整合失败 (耗时: %.2f秒): %s", elapsed, e)
             return self._simple_integration(state)
     
     def _simple_integration(self, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -381,83 +502,131 @@ class ContractCoordinator(BaseAgent):
         report = {
             "status": "success",
             "summary": "审查完成",
-            "document_analysis": str(state.get("document_result", ""))[:500],
-            "legal_analysis": str(state.get("legal_result", ""))[:500],
-            "business_analysis": str(state.get("business_result", ""))[:500],
+            "document_analysis": _preview(state.get("document_result", ""), 500),
+            "legal_analysis": _preview(state.get("legal_result", ""), 500),
+            "business_analysis": _preview(state.get("business_result", ""), 500),
             "note": "使用简化模式生成报告"
         }
         
-        return {
-            **state,
-            "final_response": json.dumps(report, ensure_ascii=False, indent=2)
-        }
+        state.update({
+            "final_response": _dumps(report, indent=True)
+        })
+        return state
     
     def _log_performance_report(self, metrics: WorkflowMetrics):
         """记录性能报告"""
+        # 日志级别高于 INFO 时直接返回，不再查询缓存统计（Redis 后端需要网络请求）
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         self.logger.info("\n" + "="*60)
         self.logger.info("📊 性能报告")
         self.logger.info("="*60)
-        self.logger.info(f"  总耗时: {metrics.total_time:.2f} 秒")
-        self.logger.info(f"  ├─ 文档处理: {metrics.document_time:.2f} 秒")
-        self.logger.info(f"  ├─ 并行分析: {metrics.parallel_time:.2f} 秒")
-        self.logger.info(f"  └─ 结果整合: {metrics.integration_time:.2f} 秒")
+        self.logger.info("  总耗时: %.2f 秒", metrics.total_time)
+        self.logger.info("  ├─ 文档处理: %.2f 秒", metrics.document_time)
+        self.logger.info("  ├─ 并行分析: %.2f 秒", metrics.parallel_time)
+        self.logger.info("  └─ 结果整合: %.2f 秒", metrics.integration_time)
+        self.logger.info("  分析结果缓存命中: %d 次", metrics.cache_hits)
         
         if self.cache:
             cache_stats = self.cache.stats()
-            self.logger.info(f"  缓存命中率: {cache_stats['hit_rate']*100:.1f}%")
+            self.logger.info("  缓存命中率: %.1f%%", cache_stats['hit_rate']*100)
         
         self.logger.info("="*60 + "\n")
     
+    def get_performance_stats(self) -> Dict[str, Any]:
+        """获取性能统计信息（附带最近工作流各阶段耗时的汇总）"""
+        stats = super().get_performance_stats()
+        if self._workflow_history:
+            stats["workflow"] = {
+                "count": len(self._workflow_history),
+                **{
+                    stage: _summarize_times([getattr(m, stage) for m in self._workflow_history])
+                    for stage in _WORKFLOW_STAGES
+                }
+            }
+        return stats
+    
     def process_text_message(self, message: HumanMessage) -> HumanMessage:
-        """处理用户请求（入口）"""
-        user_input = message.content
-        thread_id = str(uuid.uuid4())
+        """同步入口：在常驻的后台事件循环中运行异步工作流"""
+        future = asyncio.run_coroutine_threadsafe(self.aprocess_text_message(message), _get_background_loop())
+        return future.result()
+    
+    def _prepare_workflow(self, user_input: str) -> Tuple[Dict[str, Any], RunnableConfig]:
+        """生成工作流的初始状态和运行配置"""
+        thread_id = secrets.token_hex(8)
+        
+        # 处理策略只取决于输入长度，直接查表写入初始状态，无需单独的规划节点
+        strategy = _PLAN_STRATEGIES[bisect_right(_PLAN_THRESHOLDS, len(user_input))]
         
         self.logger.info("\n" + "="*60)
         self.logger.info("🚀 收到新的审查请求")
-        self.logger.info(f"📝 Thread ID: {thread_id}")
-        self.logger.info(f"📄 输入长度: {len(user_input):,} 字符")
+        self.logger.info("📝 Thread ID: %s", thread_id)
+        self.logger.info("📄 输入长度: %d 字符 (处理策略: %s)", len(user_input), strategy)
         self.logger.info("="*60 + "\n")
         
+        initial_state = {
+            "user_input": user_input,
+            "workflow_plan": strategy,
+            "metrics": WorkflowMetrics(),
+            "final_response": "",
+            "error": None
+        }
+        return initial_state, {"configurable": {"thread_id": thread_id, "coordinator": self}}
+    
+    async def astream_text_message(self, message: HumanMessage) -> AsyncIterator[Dict[str, Any]]:
+        """流式处理用户请求：每个节点完成后立即产出该阶段的结果，无需等待整份报告"""
+        initial_state, run_config = self._prepare_workflow(message.content)
+        
+        deadline_token = _workflow_deadline.set(time.monotonic() + Config.PERFORMANCE_CONFIG.total_timeout)
+        
+        try:
+            async for update in self.graph.astream(initial_state, config=run_config, stream_mode="updates"):
+                for node, node_state in update.items():
+                    event = {"node": node, "error": node_state.get("error")}
+                    for field in _STREAM_FIELDS.get(node, ()):
+                        event[field] = node_state.get(field)
+                    yield event
+        finally:
+            _workflow_deadline.reset(deadline_token)
+    
+    async def aprocess_text_message(self, message: HumanMessage) -> HumanMessage:
+        """处理用户请求（入口）"""
+        initial_state, run_config = self._prepare_workflow(message.content)
+        
         workflow_start = time.time()
         
+        # 整个工作流共用一个截止时间（节点任务会继承当前上下文）
+        deadline_token = _workflow_deadline.set(time.monotonic() + Config.PERFORMANCE_CONFIG.total_timeout)
+        
         try:
             # 运行工作流
-            result = self.graph.invoke(
-                {
-                    "user_input": user_input,
-                    "final_response": "",
-                    "error": None
-                },
-                config={"configurable": {"thread_id": thread_id}}
-            )
+            result = await self.graph.ainvoke(initial_state, config=run_config)
             
             final_response = result.get("final_response", "未生成报告")
             
             workflow_elapsed = time.time() - workflow_start
             
             if result.get("error"):
-                self.logger.warning(f"⚠️ 工作流存在错误: {result['error']}")
+                self.logger.warning("⚠️ 工作流存在错误: %s", result['error'])
             else:
-                self.logger.info(f"✅ 工作流执行成功")
+                self.logger.info("✅ 工作流执行成功")
             
-            self.logger.info(f"\n🏁 审查流程完成 (总耗时: {workflow_elapsed:.2f}秒)\n")
+            self.logger.info("\n🏁 审查流程完成 (总耗时: %.2f秒)\n", workflow_elapsed)
             
             return HumanMessage(content=final_response)
             
         except Exception as e:
             workflow_elapsed = time.time() - workflow_start
             self.logger.error(
-                f"❌ 工作流失败 (耗时: {workflow_elapsed:.2f}秒): {e}",
+                "❌ 工作流失败 (耗时: %.2f秒): %s", workflow_elapsed, e,
                 exc_info=True
             )
             error_message = f"审查流程失败: {str(e)}"
             return HumanMessage(content=error_message)
-    
-    def __del__(self):
-        """清理资源"""
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
+        
+        finally:
+            _workflow_deadline.reset(deadline_token)
 
 if __name__ == "__main__":
     print("\n" + "="*60)
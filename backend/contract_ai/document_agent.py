@@ -1,11 +1,23 @@
 import re
 import json
 import requests
-from typing import Dict, List, Any, Optional, Callable
-from base_agent import BaseAgent
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any
+from contract_ai.base_agent import BaseAgent
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 
+# requests-toolbelt 可边读文件边发送 multipart 请求体，未安装时回退到 requests 的整体编码
+try:
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+# 复用连接的 HTTP 会话（PDF 上传接口），避免每次请求重新建立 TCP 连接
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
 
 # 招标场景核心提取字段
 TENDER_CORE_FIELDS = [
@@ -25,15 +37,12 @@ TENDER_CORE_FIELDS = [
     "project_location",  # 项目地点
 ]
 
-# 招标核心章节关键词
-TENDER_SECTION_KEYWORDS = {
-    "基本信息": ["项目名称", "招标编号", "招标方式", "招标人", "代理机构"],
-    "财务相关": ["预算", "最高限价", "投标保证金", "付款方式", "金额"],
-    "时间要求": ["截止时间", "开标时间", "公告期限", "投标有效期", "实施周期"],
-    "资格要求": ["投标人资格", "资质条件", "准入标准", "报名条件", "注册资金"],
-    "评审标准": ["评审标准", "评标办法", "打分细则", "中标条件", "价格权重"],
-    "招标范围": ["招标范围", "采购内容", "服务要求", "技术参数", "项目内容"],
-}
+# 关键信息提取的分块大小（每块单独调用一次LLM，块间重叠避免字段被截断）
+EXTRACTION_CHUNK_SIZE = 4000
+EXTRACTION_CHUNK_OVERLAP = 400
+
+# 补全缺失字段时使用的文档前缀长度（避免token超限）
+SUPPLEMENT_TEXT_LIMIT = 8000
 
 class DocumentProcessingAgent(BaseAgent):
     """Agent specialized in tender document processing and key information extraction"""
@@ -57,8 +66,8 @@ class DocumentProcessingAgent(BaseAgent):
 输出格式应该结构化，包含关键信息字典、文档结构分析、文本统计等模块。"""
 
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,  # 每块最大字符数（适配LLM上下文）
-            chunk_overlap=200,  # 块重叠字符数（避免拆分关键信息）
+            chunk_size=EXTRACTION_CHUNK_SIZE,  # 每块最大字符数（适配LLM上下文）
+            chunk_overlap=EXTRACTION_CHUNK_OVERLAP,  # 块重叠字符数（避免拆分关键信息）
             separators=["\n\n", "\n", "。", "；", " "],  # 优先按段落拆分
         )
         self.extraction_prompt = self._build_extraction_prompt()
@@ -88,11 +97,21 @@ class DocumentProcessingAgent(BaseAgent):
                     )
                 }
                 
-                response = requests.post(
-                    url=api_url,
-                    files=files,
-                    timeout=60  # 设置超时时间，避免长期无响应
-                )
+                if MultipartEncoder is not None:
+                    # 流式上传：请求体按块从文件读取，不在内存中拼出整个PDF
+                    encoder = MultipartEncoder(fields=files)
+                    response = _HTTP_SESSION.post(
+                        url=api_url,
+                        data=encoder,
+                        headers={'Content-Type': encoder.content_type},
+                        timeout=60
+                    )
+                else:
+                    response = _HTTP_SESSION.post(
+                        url=api_url,
+                        files=files,
+                        timeout=60  # 设置超时时间，避免长期无响应
+                    )
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -158,53 +177,46 @@ class DocumentProcessingAgent(BaseAgent):
         cleaned_text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9\s，。；：""''（）《》、·！？￥$¥%&*+=-_(){}[]]', '', cleaned_text)
         return cleaned_text
 
-    def _split_document_by_keywords(self, cleaned_text: str) -> Dict[str, List[str]]:
-        """按关键词分块：将文档拆分为核心章节对应的区块"""
-        keyword_chunks = {section: [] for section in TENDER_SECTION_KEYWORDS.keys()}
-        # 先按通用分块器拆分基础块
-        base_chunks = self.text_splitter.split_text(cleaned_text)
-        
-        # 为每个基础块匹配对应的核心章节
-        for chunk in base_chunks:
-            for section, keywords in TENDER_SECTION_KEYWORDS.items():
-                if any(keyword in chunk for keyword in keywords):
-                    keyword_chunks[section].append(chunk)
-                    break  # 一个块只匹配一个核心章节
-        
-        # 合并每个章节的区块（避免过于零散）
-        merged_chunks = {}
-        for section, chunks in keyword_chunks.items():
-            if chunks:
-                merged_chunks[section] = " ".join(chunks)[:]  # 限制单章节长度
-        
-        return merged_chunks
+    def _split_document(self, cleaned_text: str) -> List[str]:
+        """将文档拆分为有上限、相互重叠的区块（全文都参与提取，单块不超过 EXTRACTION_CHUNK_SIZE）"""
+        # 超过 max_text_length 的部分截断，限制单个文档的LLM调用次数
+        return self.text_splitter.split_text(self._preprocess_text(cleaned_text))
 
-    def _extract_from_chunk(self, chunk_text: str) -> Dict[str, Any]:
-        """从单个区块提取信息（已修复卡死问题）"""
-        try:
-            extraction_chain = self.extraction_prompt | self.llm
-            # 增加 timeout 防止网络层卡死
-            response = extraction_chain.invoke({"document_chunk": chunk_text})
-            
-            # 使用新的提取器
-            extracted_list = self.extractor.extract(response.content)
-            
-            if extracted_list:
-                # 合并提取到的所有字典（有些模型可能会分多个对象返回）
-                merged = {field: None for field in TENDER_CORE_FIELDS}
-                for item in extracted_list:
-                    for k, v in item.items():
-                        if k in TENDER_CORE_FIELDS and v is not None:
-                            merged[k] = v
-                return merged
-            else:
-                self.logger.warning("LLM返回了内容，但无法解析为JSON")
-                return {field: None for field in TENDER_CORE_FIELDS}
-                
-        except Exception as e:
-            self.logger.error(f"区块提取发生异常: {str(e)}")
+    def _parse_extraction_response(self, content: str) -> Dict[str, Any]:
+        """解析LLM返回的提取结果"""
+        # 使用新的提取器
+        extracted_list = self.extractor.extract(content)
+        
+        if extracted_list:
+            # 合并提取到的所有字典（有些模型可能会分多个对象返回）
+            merged = {field: None for field in TENDER_CORE_FIELDS}
+            for item in extracted_list:
+                for k, v in item.items():
+                    if k in TENDER_CORE_FIELDS and v is not None:
+                        merged[k] = v
+            return merged
+        else:
+            self.logger.warning("LLM返回了内容，但无法解析为JSON")
             return {field: None for field in TENDER_CORE_FIELDS}
 
+    def _extract_from_chunks(self, chunk_texts: List[str]) -> List[Dict[str, Any]]:
+        """批量并发提取多个区块（每次调用占用进程内共用的LLM并发名额，避免触发限流）"""
+        extraction_chain = self.extraction_prompt | RunnableLambda(self._limited_llm_invoke)
+        responses = extraction_chain.batch(
+            [{"document_chunk": chunk_text} for chunk_text in chunk_texts],
+            config={"max_concurrency": self.performance_config.max_llm_concurrency},
+            return_exceptions=True
+        )
+        
+        results = []
+        for response in responses:
+            if isinstance(response, Exception):
+                self.logger.error(f"区块提取发生异常: {str(response)}")
+                results.append({field: None for field in TENDER_CORE_FIELDS})
+            else:
+                results.append(self._parse_extraction_response(response.content))
+        return results
+
     def _merge_extracted_results(self, results_list: List[Dict[str, Any]]) -> Dict[str, Any]:
         """合并多区块提取结果:取非空值、去重、整合列表"""
         print(f"_merge_extracted_results 接收到 {len(results_list)} 个结果")
@@ -252,14 +264,14 @@ class DocumentProcessingAgent(BaseAgent):
             print(f"缺失字段过多({len(missing_fields)}个)，跳过补全")
             return merged_result
         
-        # 限制全文长度，避免token超限（最多使用前8000字符）
-        # truncated_text = full_text[:8000] if len(full_text) > 8000 else full_text
-        # print(f"使用文本长度: {len(truncated_text)} 字符进行补全")
+        # 限制全文长度，避免token超限（最多使用前 SUPPLEMENT_TEXT_LIMIT 字符）
+        truncated_text = full_text[:SUPPLEMENT_TEXT_LIMIT]
+        self.logger.debug("使用文本长度: %d 字符进行补全", len(truncated_text))
         
         # 为缺失字段构建针对性检索Prompt
         supplement_prompt = f"""
         以下是招标文件片段：
-        {full_text}
+        {truncated_text}
         
         请补充提取以下缺失的字段（仅返回字段值，用JSON格式，未找到填null）：
         {json.dumps(missing_fields, ensure_ascii=False)}
@@ -272,8 +284,7 @@ class DocumentProcessingAgent(BaseAgent):
         
         try:
             print("开始调用LLM补全缺失字段...")
-            response = self.llm.invoke(supplement_prompt)
-            print("LLM补全调用完成")
+            response = self._limited_llm_invoke(supplement_prompt)
             print("LLM补全调用完成")
             supplement_data = json.loads(response.content)
             print(f"补全数据解析成功: {list(supplement_data.keys())}")
@@ -295,19 +306,17 @@ class DocumentProcessingAgent(BaseAgent):
         cleaned_text = self._preprocess_document(document_text)
         print(f"预处理后文档长度：{len(cleaned_text)}字符")
         
-        # 2. 按关键词分块（聚焦核心章节）
-        keyword_chunks = self._split_document_by_keywords(cleaned_text)
-        print(f"分块完成，有效章节：{list(keyword_chunks.keys())}")
+        # 2. 分块（每块有长度上限，块间重叠）
+        chunks = self._split_document(cleaned_text)
+        self.logger.debug("分块完成，共 %d 块", len(chunks))
         
-        # 3. 逐区块提取信息
-        results_list = []
-        for section, chunk in keyword_chunks.items():
-            print(f"正在提取【{section}】相关信息...")
-            extracted = self._extract_from_chunk(chunk)
-            print(f"【{section}】提取结果类型: {type(extracted)}, 内容预览: {str(extracted)[:100]}...")
-            results_list.append(extracted)
+        # 3. 各区块并发提取信息
+        self.logger.debug("正在并发提取 %d 个区块", len(chunks))
+        results_list = self._extract_from_chunks(chunks)
+        for idx, extracted in enumerate(results_list, 1):
+            self.logger.debug("【区块 %d】提取结果类型: %s, 内容预览: %.100s...", idx, type(extracted), extracted)
         
-        print(f"所有章节提取完成，results_list长度: {len(results_list)}")
+        self.logger.debug("所有区块提取完成，results_list长度: %d", len(results_list))
         
         # 4. 合并多区块结果
         print("开始合并结果...")
@@ -360,23 +369,6 @@ class DocumentProcessingAgent(BaseAgent):
                 "timestamp": self._get_current_timestamp()
             }
     
-    def extract_task_info(self, text: str) -> Dict[str, Any]:
-        """Extract task information from the input text"""
-        lines = text.split('\n')
-        task_info = {"content": text}
-        
-        for line in lines:
-            if line.startswith("任务："):
-                task_info["task"] = line.replace("任务：", "").strip()
-            elif line.startswith("上下文："):
-                # Everything after "上下文：" is the tender document content
-                context_start = text.find("上下文：")
-                if context_start != -1:
-                    task_info["content"] = text[context_start + 4:].strip()
-                break
-        
-        return task_info
-    
     def process_tender_document(self, document_text: str) -> Dict[str, Any]:
         """Main tender document processing function"""
         key_tender_info = self.extract_key_information(document_text)
@@ -480,9 +472,7 @@ class DocumentProcessingAgent(BaseAgent):
         
         # Use LLM to extract structured tender information
         extraction_prompt = f"""
-        请从以下招标文件文本中提取关键信息，以JSON格式返回：
-        
-        文本：{text}...
+        请从文末的招标文件文本中提取关键信息，以JSON格式返回。
         
         请提取以下招标核心信息，未找到的项标记为null：
         1. tender_title - 招标项目名称
@@ -499,9 +489,11 @@ class DocumentProcessingAgent(BaseAgent):
         12. implementation_period - 项目实施周期
         
         返回严格的JSON格式，不要包含额外说明文字。
+        
+        文本：{text}...
         """
         
-        llm_response = self.call_llm(extraction_prompt)
+        llm_response = self.call_llm(extraction_prompt, semantic_key=text)
         
         try:
             extracted_info = json.loads(llm_response)
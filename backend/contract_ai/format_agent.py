@@ -1,7 +1,6 @@
 import re
-import json
-from typing import Dict, List, Any, Optional
-from base_agent import BaseAgent
+from typing import Dict, List, Any
+from contract_ai.base_agent import BaseAgent
 
 class FormatAgent(BaseAgent):
     """Agent specialized in document formatting and structure analysis"""
@@ -95,22 +94,6 @@ class FormatAgent(BaseAgent):
                 "timestamp": self._get_current_timestamp()
             }
     
-    def extract_task_info(self, text: str) -> Dict[str, Any]:
-        """Extract task information from the input text"""
-        lines = text.split('\n')
-        task_info = {"content": text}
-        
-        for line in lines:
-            if line.startswith("任务："):
-                task_info["task"] = line.replace("任务：", "").strip()
-            elif line.startswith("上下文："):
-                context_start = text.find("上下文：")
-                if context_start != -1:
-                    task_info["content"] = text[context_start + 4:].strip()
-                break
-        
-        return task_info
-    
     def perform_format_analysis(self, document_text: str) -> Dict[str, Any]:
         """Perform comprehensive format analysis"""
         analysis = {
@@ -684,9 +667,7 @@ class FormatAgent(BaseAgent):
     def get_llm_format_analysis(self, text: str) -> str:
         """Get detailed format analysis from LLM"""
         analysis_prompt = f"""
-        请对以下合同文档进行专业的格式分析：
-        
-        文档内容：{text}...
+        请对文末的合同文档进行专业的格式分析。
         
         请从以下格式角度进行详细分析：
         1. 文档整体结构和布局
@@ -698,9 +679,11 @@ class FormatAgent(BaseAgent):
         7. 专业性和可读性评估
         
         请提供具体的格式改进建议和最佳实践指导。
+        
+        文档内容：{text}...
         """
         
-        return self.call_llm(analysis_prompt)
+        return self.call_llm(analysis_prompt, semantic_key=text)
     
     def format_analysis_results(self, analysis: Dict[str, Any]) -> str:
         """Format analysis results for output"""
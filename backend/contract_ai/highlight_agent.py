@@ -1,7 +1,6 @@
 import re
-import json
-from typing import Dict, List, Any, Optional, Tuple
-from base_agent import BaseAgent
+from typing import Dict, List, Any
+from contract_ai.base_agent import BaseAgent
 
 class HighlightAgent(BaseAgent):
     """Agent specialized in highlighting key points and important clauses"""
@@ -139,22 +138,6 @@ class HighlightAgent(BaseAgent):
                 "timestamp": self._get_current_timestamp()
             }
     
-    def extract_task_info(self, text: str) -> Dict[str, Any]:
-        """Extract task information from the input text"""
-        lines = text.split('\n')
-        task_info = {"content": text}
-        
-        for line in lines:
-            if line.startswith("任务："):
-                task_info["task"] = line.replace("任务：", "").strip()
-            elif line.startswith("上下文："):
-                context_start = text.find("上下文：")
-                if context_start != -1:
-                    task_info["content"] = text[context_start + 4:].strip()
-                break
-        
-        return task_info
-    
     def perform_highlight_analysis(self, document_text: str) -> Dict[str, Any]:
         """Perform comprehensive highlighting analysis"""
         analysis = {
@@ -687,9 +670,7 @@ class HighlightAgent(BaseAgent):
     def get_llm_highlight_analysis(self, text: str) -> str:
         """Get detailed highlight analysis from LLM"""
         analysis_prompt = f"""
-        请对以下合同文本进行重点标注分析：
-        
-        合同文本：{text}...
+        请对文末的合同文本进行重点标注分析。
         
         请识别并分析：
         1. 最重要的关键条款和信息点
@@ -700,9 +681,11 @@ class HighlightAgent(BaseAgent):
         6. 对合同履行至关重要的条款
         
         请提供具体的标注建议和注意事项。
+        
+        合同文本：{text}...
         """
         
-        return self.call_llm(analysis_prompt)
+        return self.call_llm(analysis_prompt, semantic_key=text)
     
     def format_highlight_results(self, analysis: Dict[str, Any]) -> str:
         """Format highlight analysis results for output"""
@@ -5,10 +5,9 @@ Integration Agent Final - Fully Matching Frontend Data Format
 
 import json
 import re
-import logging
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Set
 from datetime import datetime
-from base_agent import BaseAgent
+from contract_ai.base_agent import BaseAgent
 
 class RiskAggregator:
     """风险信息聚合器 - 确保不遗漏任何风险"""
@@ -73,7 +72,6 @@ class IntegrationAgent(BaseAgent):
 职责：完整保留所有风险信息，生成符合前端UI的结构化报告。"""
         
         super().__init__("IntegrationAgentFinal", system_prompt)
-        self.risk_aggregator = RiskAggregator()
         
     def invoke(self, input: dict, config=None, **kwargs):
         """重写invoke方法"""
@@ -86,87 +84,88 @@ class IntegrationAgent(BaseAgent):
         self.logger.info("开始整合分析结果（前端格式）")
         self.logger.info("="*60)
         
-        # 重置风险聚合器
-        self.risk_aggregator = RiskAggregator()
+        # 每次整合使用独立的风险聚合器：智能体被并发的审查共享，不能保存在实例上
+        aggregator = RiskAggregator()
         
         # 步骤1: 提取所有风险
-        self._extract_all_risks(results)
+        self._extract_all_risks(aggregator, results)
         
         # 步骤2: 构建前端格式报告
-        frontend_format_report = self._build_frontend_format_report(results)
+        frontend_format_report = self._build_frontend_format_report(aggregator, results)
         
         # 步骤3: 验证完整性
         self._verify_completeness(results, frontend_format_report)
         
         self.logger.info("="*60)
-        self.logger.info(f"✅ 整合完成，共识别 {len(self.risk_aggregator.all_risks)} 个风险")
+        self.logger.info(f"✅ 整合完成，共识别 {len(aggregator.all_risks)} 个风险")
         self.logger.info("="*60)
         
         return frontend_format_report
     
-    def _extract_all_risks(self, results: Dict[str, Any]):
+    def _extract_all_risks(self, aggregator: RiskAggregator, results: Dict[str, Any]):
         """从所有来源提取风险"""
         self.logger.info("🔍 第1步: 提取所有风险信息")
         
         # 从文档分析提取
         if results.get('document'):
-            self._extract_risks_from_document(results['document'])
+            self._extract_risks_from_document(aggregator, results['document'])
         
         # 从法律分析提取
         if results.get('legal'):
-            self._extract_risks_from_legal(results['legal'])
+            self._extract_risks_from_legal(aggregator, results['legal'])
         
         # 从商业分析提取
         if results.get('business'):
-            self._extract_risks_from_business(results['business'])
+            self._extract_risks_from_business(aggregator, results['business'])
         
         # 记录统计
-        risks_by_severity = self.risk_aggregator.get_risks_by_severity()
-        self.logger.info(f"  📊 总计: {len(self.risk_aggregator.all_risks)} 个风险")
+        risks_by_severity = aggregator.get_risks_by_severity()
+        self.logger.info(f"  📊 总计: {len(aggregator.all_risks)} 个风险")
         self.logger.info(f"     - 高风险: {len(risks_by_severity['高'])} 个")
         self.logger.info(f"     - 中风险: {len(risks_by_severity['中'])} 个")
         self.logger.info(f"     - 低风险: {len(risks_by_severity['低'])} 个")
     
-    def _extract_risks_from_document(self, document_result: Any):
+    def _extract_risks_from_document(self, aggregator: RiskAggregator, document_result: Any):
         """从文档分析中提取风险"""
         try:
             if isinstance(document_result, str):
                 try:
                     data = json.loads(document_result)
-                    self._process_document_data(data)
+                    self._process_document_data(aggregator, data)
                 except json.JSONDecodeError:
-                    self._extract_risks_from_text(document_result, 'document')
+                    self._extract_risks_from_text(aggregator, document_result, 'document')
             elif isinstance(document_result, dict):
-                self._process_document_data(document_result)
+                self._process_document_data(aggregator, document_result)
         except Exception as e:
             self.logger.warning(f"⚠️ 文档风险提取异常: {e}")
     
-    def _process_document_data(self, data: Dict[str, Any]):
+    def _process_document_data(self, aggregator: RiskAggregator, data: Dict[str, Any]):
         """处理文档数据"""
         analysis = data.get('analysis', {})
         
         if 'risk_assessment' in analysis:
             self._extract_structured_risks(
+                aggregator,
                 analysis['risk_assessment'], 
                 'document', 
                 '文档分析'
             )
     
-    def _extract_risks_from_legal(self, legal_result: Any):
+    def _extract_risks_from_legal(self, aggregator: RiskAggregator, legal_result: Any):
         """从法律分析中提取风险 - 完整提取"""
         try:
             if isinstance(legal_result, str):
                 try:
                     data = json.loads(legal_result)
-                    self._process_legal_data(data)
+                    self._process_legal_data(aggregator, data)
                 except json.JSONDecodeError:
-                    self._extract_risks_from_text(legal_result, 'legal')
+                    self._extract_risks_from_text(aggregator, legal_result, 'legal')
             elif isinstance(legal_result, dict):
-                self._process_legal_data(legal_result)
+                self._process_legal_data(aggregator, legal_result)
         except Exception as e:
             self.logger.warning(f"⚠️ 法律风险提取异常: {e}")
     
-    def _process_legal_data(self, data: Dict[str, Any]):
+    def _process_legal_data(self, aggregator: RiskAggregator, data: Dict[str, Any]):
         """处理法律数据 - 多层次提取"""
         analysis = data.get('analysis', {})
         
@@ -175,7 +174,7 @@ class IntegrationAgent(BaseAgent):
             risk_assessment = analysis['risk_assessment']
             
             for high_risk in risk_assessment.get('high_risk', []):
-                self.risk_aggregator.add_risk({
+                aggregator.add_risk({
                     'category': high_risk.get('category', '法律高风险'),
                     'description': self._extract_risk_description(high_risk),
                     'severity': '高',
@@ -184,7 +183,7 @@ class IntegrationAgent(BaseAgent):
                 }, 'legal')
             
             for medium_risk in risk_assessment.get('medium_risk', []):
-                self.risk_aggregator.add_risk({
+                aggregator.add_risk({
                     'category': medium_risk.get('category', '法律中风险'),
                     'description': self._extract_risk_description(medium_risk),
                     'severity': '中',
@@ -193,7 +192,7 @@ class IntegrationAgent(BaseAgent):
                 }, 'legal')
             
             for low_risk in risk_assessment.get('low_risk', []):
-                self.risk_aggregator.add_risk({
+                aggregator.add_risk({
                     'category': low_risk.get('category', '法律低风险'),
                     'description': self._extract_risk_description(low_risk),
                     'severity': '低',
@@ -206,7 +205,7 @@ class IntegrationAgent(BaseAgent):
             compliance = analysis['compliance_check']
             for clause in compliance.get('required_clauses', []):
                 if not clause.get('present', True):
-                    self.risk_aggregator.add_risk({
+                    aggregator.add_risk({
                         'category': '合规风险',
                         'description': f"缺失必要条款: {clause.get('name', '未知')}",
                         'severity': '高' if clause.get('mandatory', False) else '中',
@@ -217,33 +216,34 @@ class IntegrationAgent(BaseAgent):
         if 'recommendations' in analysis:
             for rec in analysis['recommendations']:
                 if rec.get('priority') == '高':
-                    self.risk_aggregator.add_risk({
+                    aggregator.add_risk({
                         'category': '需改进项',
                         'description': rec.get('recommendation', ''),
                         'severity': '高',
                         'type': rec.get('type', '')
                     }, 'legal')
     
-    def _extract_risks_from_business(self, business_result: Any):
+    def _extract_risks_from_business(self, aggregator: RiskAggregator, business_result: Any):
         """从商业分析中提取风险"""
         try:
             if isinstance(business_result, str):
                 try:
                     data = json.loads(business_result)
-                    self._process_business_data(data)
+                    self._process_business_data(aggregator, data)
                 except json.JSONDecodeError:
-                    self._extract_risks_from_text(business_result, 'business')
+                    self._extract_risks_from_text(aggregator, business_result, 'business')
             elif isinstance(business_result, dict):
-                self._process_business_data(business_result)
+                self._process_business_data(aggregator, business_result)
         except Exception as e:
             self.logger.warning(f"⚠️ 商业风险提取异常: {e}")
     
-    def _process_business_data(self, data: Dict[str, Any]):
+    def _process_business_data(self, aggregator: RiskAggregator, data: Dict[str, Any]):
         """处理商业数据"""
         analysis = data.get('analysis', {})
         
         if 'risk_assessment' in analysis:
             self._extract_structured_risks(
+                aggregator,
                 analysis['risk_assessment'],
                 'business',
                 '商业分析'
@@ -251,13 +251,14 @@ class IntegrationAgent(BaseAgent):
     
     def _extract_structured_risks(
         self,
+        aggregator: RiskAggregator,
         risk_data: Dict[str, Any],
         source: str,
         category_prefix: str
     ):
         """提取结构化风险"""
         for risk in risk_data.get('high_risk', []):
-            self.risk_aggregator.add_risk({
+            aggregator.add_risk({
                 'category': f"{category_prefix}-{risk.get('category', '高')}",
                 'description': self._extract_risk_description(risk),
                 'severity': '高',
@@ -265,7 +266,7 @@ class IntegrationAgent(BaseAgent):
             }, source)
         
         for risk in risk_data.get('medium_risk', []):
-            self.risk_aggregator.add_risk({
+            aggregator.add_risk({
                 'category': f"{category_prefix}-{risk.get('category', '中')}",
                 'description': self._extract_risk_description(risk),
                 'severity': '中',
@@ -273,14 +274,14 @@ class IntegrationAgent(BaseAgent):
             }, source)
         
         for risk in risk_data.get('low_risk', []):
-            self.risk_aggregator.add_risk({
+            aggregator.add_risk({
                 'category': f"{category_prefix}-{risk.get('category', '低')}",
                 'description': self._extract_risk_description(risk),
                 'severity': '低',
                 'details': risk.get('issues', [])
             }, source)
     
-    def _extract_risks_from_text(self, text: str, source: str):
+    def _extract_risks_from_text(self, aggregator: RiskAggregator, text: str, source: str):
         """从文本中提取风险"""
         risk_keywords = [
             '风险', '问题', '缺失', '不符合', '违反',
@@ -301,7 +302,7 @@ class IntegrationAgent(BaseAgent):
                 elif '轻微' in sentence or '较小' in sentence:
                     severity = '低'
                 
-                self.risk_aggregator.add_risk({
+                aggregator.add_risk({
                     'category': f'{source}识别风险',
                     'description': sentence,
                     'severity': severity
@@ -318,12 +319,12 @@ class IntegrationAgent(BaseAgent):
                 return desc
         return str(risk)
     
-    def _build_frontend_format_report(self, results: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_frontend_format_report(self, aggregator: RiskAggregator, results: Dict[str, Any]) -> Dict[str, Any]:
         """构建完全匹配前端格式的报告"""
         self.logger.info("🔍 第2步: 构建前端格式报告")
         
-        all_risks = self.risk_aggregator.get_all_risks()
-        risks_by_severity = self.risk_aggregator.get_risks_by_severity()
+        all_risks = aggregator.get_all_risks()
+        risks_by_severity = aggregator.get_risks_by_severity()
         
         # 计算风险评分
         overall_risk_score = self._calculate_risk_score(risks_by_severity)
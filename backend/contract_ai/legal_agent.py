@@ -1,7 +1,6 @@
-import json
 import re
-from typing import Dict, List, Any, Optional
-from base_agent import BaseAgent
+from typing import Dict, List, Any
+from contract_ai.base_agent import BaseAgent
 
 class LegalAgent(BaseAgent):
     """Agent specialized in tender document analysis and compliance checking"""
@@ -92,22 +91,6 @@ class LegalAgent(BaseAgent):
                 "timestamp": self._get_current_timestamp()
             }
     
-    def extract_task_info(self, text: str) -> Dict[str, Any]:
-        """Extract task information from the input text"""
-        lines = text.split('\n')
-        task_info = {"content": text}
-        
-        for line in lines:
-            if line.startswith("任务："):
-                task_info["task"] = line.replace("任务：", "").strip()
-            elif line.startswith("上下文："):
-                context_start = text.find("上下文：")
-                if context_start != -1:
-                    task_info["content"] = text[context_start + 4:].strip()
-                break
-        
-        return task_info
-    
     def perform_tender_analysis(self, document_text: str) -> Dict[str, Any]:
         """Perform comprehensive tender document analysis"""
         analysis = {
@@ -671,9 +654,7 @@ class LegalAgent(BaseAgent):
     def get_llm_tender_analysis(self, text: str) -> str:
         """Get detailed tender document analysis from LLM"""
         analysis_prompt = f"""
-        请对以下招标文件进行专业的法律分析：
-        
-        招标文件文本：{text[:3000]}...
+        请对文末的招标文件进行专业的法律分析。
         
         请从以下角度进行分析：
         1. 招标程序的合法性评估
@@ -684,9 +665,11 @@ class LegalAgent(BaseAgent):
         6. 需要补充或修改的条款
         
         请提供具体、专业的法律意见和建议。
+        
+        招标文件文本：{text[:3000]}...
         """
         
-        return self.call_llm(analysis_prompt)
+        return self.call_llm(analysis_prompt, semantic_key=text[:3000])
     
     def generate_tender_recommendations(self, text: str) -> List[Dict[str, str]]:
         """Generate tender document recommendations"""
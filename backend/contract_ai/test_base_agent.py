@@ -1,6 +1,15 @@
+import sys
+import json
+import asyncio
+import threading
+import time
 import unittest
-from unittest.mock import patch, MagicMock
-from base_agent import BaseAgent
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock, AsyncMock
+from contract_ai.base_agent import (
+    BaseAgent, SimpleCache, SemanticCache, RedisCache, LLMConcurrencyLimiter, create_cache, np
+)
+from contract_ai.config import CacheConfig
 from langchain_core.messages import HumanMessage, SystemMessage
 
 class TestBaseAgent(unittest.TestCase):
@@ -23,7 +32,7 @@ class TestBaseAgent(unittest.TestCase):
         self.assertIsNotNone(self.agent.logger)
         self.assertIsNotNone(self.agent.llm)
 
-    @patch('base_agent.logging')
+    @patch('contract_ai.base_agent.logging')
     def test_setup_logging(self, mock_logging):
         """测试日志配置是否正确设置"""
         self.agent.setup_logging()
@@ -85,6 +94,100 @@ class TestBaseAgent(unittest.TestCase):
         self.assertEqual(len(self.mock_llm.invoke.call_args[0][0]), 4)
         self.assertEqual(result, mock_response.content)
 
+    def test_acall_llm_uses_ainvoke(self):
+        """测试异步LLM调用使用ainvoke"""
+        mock_response = MagicMock()
+        mock_response.content = "Async response"
+        self.mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+        
+        result = asyncio.run(self.agent.acall_llm("Async message", use_cache=False))
+        
+        self.mock_llm.ainvoke.assert_awaited_once()
+        self.mock_llm.invoke.assert_not_called()
+        self.assertEqual(result, mock_response.content)
+
+    def _enable_semantic_cache(self, fits=True):
+        """为代理挂上mock语义缓存"""
+        semantic_cache = MagicMock()
+        semantic_cache.fits.return_value = fits
+        semantic_cache.lookup.return_value = (None, "query-vector")
+        self.agent.semantic_cache = semantic_cache
+        return semantic_cache
+
+    def test_semantic_lookup_uses_semantic_key(self):
+        """测试语义缓存只按文档文本查找，而不是带固定指令前缀的完整提示词"""
+        semantic_cache = self._enable_semantic_cache()
+        semantic_cache.lookup.return_value = ("Cached analysis", "query-vector")
+        
+        result = self.agent.call_llm("固定的分析指令\n\n文档：合同正文", semantic_key="合同正文")
+        
+        semantic_cache.lookup.assert_called_once_with("合同正文")
+        self.mock_llm.invoke.assert_not_called()
+        self.assertEqual(result, "Cached analysis")
+
+    def test_semantic_lookup_skipped_without_key(self):
+        """测试未提供语义键时不查找也不写入语义缓存"""
+        semantic_cache = self._enable_semantic_cache()
+        mock_response = MagicMock()
+        mock_response.content = "Mock response"
+        self.mock_llm.invoke.return_value = mock_response
+        
+        self.agent.call_llm("Test message")
+        
+        semantic_cache.lookup.assert_not_called()
+        semantic_cache.add.assert_not_called()
+
+    def test_semantic_lookup_skipped_when_key_exceeds_window(self):
+        """测试语义键超出模型输入窗口时直接调用LLM"""
+        semantic_cache = self._enable_semantic_cache(fits=False)
+        mock_response = MagicMock()
+        mock_response.content = "Mock response"
+        self.mock_llm.invoke.return_value = mock_response
+        
+        result = self.agent.call_llm("Test message", semantic_key="long document")
+        
+        semantic_cache.lookup.assert_not_called()
+        self.mock_llm.invoke.assert_called_once()
+        self.assertEqual(result, mock_response.content)
+
+    def test_acall_llm_embeds_off_event_loop(self):
+        """测试异步调用在工作线程中计算语义向量"""
+        semantic_cache = self._enable_semantic_cache()
+        lookup_threads = []
+        
+        def lookup(text):
+            lookup_threads.append(threading.current_thread())
+            return None, "query-vector"
+        
+        semantic_cache.lookup.side_effect = lookup
+        mock_response = MagicMock()
+        mock_response.content = "Async response"
+        self.mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+        
+        asyncio.run(self.agent.acall_llm("Async message", semantic_key="document"))
+        
+        self.assertEqual(len(lookup_threads), 1)
+        self.assertIsNot(lookup_threads[0], threading.main_thread())
+        semantic_cache.add.assert_called_once_with("query-vector", "Async response")
+
+    def test_acall_llm_reads_blocking_cache_off_event_loop(self):
+        """测试缓存后端会阻塞（Redis）时，异步调用在工作线程中读写缓存"""
+        cache_threads = []
+        blocking_cache = MagicMock(blocking=True)
+        blocking_cache.get.side_effect = lambda key: cache_threads.append(threading.current_thread())
+        blocking_cache.set.side_effect = lambda key, value: cache_threads.append(threading.current_thread())
+        self.agent.cache = blocking_cache
+        mock_response = MagicMock()
+        mock_response.content = "Async response"
+        self.mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+        
+        result = asyncio.run(self.agent.acall_llm("Async message"))
+        
+        self.assertEqual(result, "Async response")
+        self.assertEqual(len(cache_threads), 2)
+        for thread in cache_threads:
+            self.assertIsNot(thread, threading.main_thread())
+
     def test_call_llm_exception_handling(self):
         """测试LLM调用异常处理"""
         error_message = "API Connection failed"
@@ -122,5 +225,215 @@ class TestBaseAgent(unittest.TestCase):
                 mock_error.assert_called_once()
                 self.assertIn(error_msg, result)
 
+class TestSimpleCache(unittest.TestCase):
+    """SimpleCache类的单元测试用例"""
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = SimpleCache(ttl=60, max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # 访问a后，b成为最久未使用
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    @patch('contract_ai.base_agent.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """测试过期条目不再返回"""
+        mock_monotonic.return_value = 100.0
+        cache = SimpleCache(ttl=10, max_size=10)
+        cache.set("key", "value")
+
+        mock_monotonic.return_value = 105.0
+        self.assertEqual(cache.get("key"), "value")
+
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+class TestLLMConcurrencyLimiter(unittest.TestCase):
+    """LLMConcurrencyLimiter类的单元测试用例"""
+
+    def test_threads_and_coroutines_share_limit(self):
+        """测试同步线程与异步协程共用同一组名额"""
+        limiter = LLMConcurrencyLimiter(2)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def enter():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+
+        def leave():
+            nonlocal active
+            with lock:
+                active -= 1
+
+        def sync_worker():
+            for _ in range(10):
+                with limiter:
+                    enter()
+                    time.sleep(0.001)
+                    leave()
+
+        async def async_worker():
+            for _ in range(10):
+                async with limiter:
+                    enter()
+                    await asyncio.sleep(0.001)
+                    leave()
+
+        async def main():
+            threads = [threading.Thread(target=sync_worker) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            await asyncio.gather(*(async_worker() for _ in range(3)))
+            for thread in threads:
+                await asyncio.to_thread(thread.join)
+
+        asyncio.run(main())
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter._available, 2)
+
+    def test_cancelled_waiter_returns_slot(self):
+        """测试等待中被取消的协程不会占走名额"""
+        limiter = LLMConcurrencyLimiter(1)
+
+        async def main():
+            limiter.acquire()
+            # 排队中取消
+            waiter = asyncio.create_task(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            # 名额转交后、恢复执行前取消
+            waiter = asyncio.create_task(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            limiter.release()
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            await asyncio.sleep(0.01)
+
+        asyncio.run(main())
+
+        self.assertEqual(limiter._available, 1)
+        self.assertEqual(len(limiter._waiters), 0)
+
+class TestRedisCache(unittest.TestCase):
+    """RedisCache类的单元测试用例（使用mock客户端）"""
+
+    def setUp(self):
+        self.client = MagicMock()
+        fake_redis = MagicMock()
+        fake_redis.Redis.from_url.return_value = self.client
+        with patch.dict(sys.modules, {"redis": fake_redis}):
+            self.cache = RedisCache("redis://test:6379/0", ttl=60, key_prefix="test:")
+
+    def test_get_decodes_prefixed_entry(self):
+        """测试按前缀读取并反序列化"""
+        self.client.get.return_value = json.dumps({"结果": "ok"}, ensure_ascii=False)
+
+        self.assertEqual(self.cache.get("key"), {"结果": "ok"})
+        self.client.get.assert_called_once_with("test:key")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_set_writes_with_ttl(self):
+        """测试写入时带前缀和过期时间"""
+        self.cache.set("key", "value")
+
+        self.client.set.assert_called_once_with("test:key", '"value"', ex=60)
+
+    def test_errors_are_treated_as_misses(self):
+        """测试Redis不可用时读写与清空都不抛出异常"""
+        self.client.get.side_effect = ConnectionError("down")
+        self.client.set.side_effect = ConnectionError("down")
+        self.client.scan_iter.side_effect = ConnectionError("down")
+
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", "value")
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+    def test_clear_deletes_only_prefixed_keys(self):
+        """测试清空时只删除当前前缀下的键"""
+        self.client.scan_iter.return_value = iter(["test:a", "test:b"])
+
+        self.cache.clear()
+
+        self.client.scan_iter.assert_called_once_with(match="test:*")
+        self.client.delete.assert_called_once_with("test:a", "test:b")
+
+class TestCreateCache(unittest.TestCase):
+    """create_cache的单元测试用例"""
+
+    def test_disabled(self):
+        """测试关闭缓存时不创建后端"""
+        self.assertIsNone(create_cache(CacheConfig(enabled=False)))
+
+    def test_memory_backend(self):
+        """测试默认使用内存缓存"""
+        cache = create_cache(CacheConfig(ttl=10, max_size=5))
+        self.assertIsInstance(cache, SimpleCache)
+        self.assertEqual(cache.max_size, 5)
+        self.assertFalse(cache.blocking)
+
+    def test_redis_backend(self):
+        """测试配置为redis时创建RedisCache"""
+        fake_redis = MagicMock()
+        with patch.dict(sys.modules, {"redis": fake_redis}):
+            cache = create_cache(CacheConfig(backend="redis", redis_url="redis://test:6379/1", key_prefix="p:"))
+
+        self.assertIsInstance(cache, RedisCache)
+        self.assertTrue(cache.blocking)
+        self.assertEqual(cache.key_prefix, "p:")
+        fake_redis.Redis.from_url.assert_called_once_with("redis://test:6379/1", decode_responses=True)
+
+@unittest.skipIf(np is None, "需要numpy")
+class TestSemanticCache(unittest.TestCase):
+    """SemanticCache类的单元测试用例"""
+
+    def _cache(self, max_size, dim):
+        """用独热向量代替模型输出：文本 "i" 对应第 i 维"""
+        cache = SemanticCache("test-model", threshold=0.9, max_size=max_size)
+        cache.embed = lambda text: np.eye(dim, dtype=np.float32)[int(text)]
+        return cache
+
+    def test_eviction_keeps_results_aligned(self):
+        """测试淘汰最早条目后向量与结果仍一一对应"""
+        cache = self._cache(max_size=2, dim=3)
+        for text in ("0", "1", "2"):
+            _, query = cache.lookup(text)
+            cache.add(query, f"result-{text}")
+
+        self.assertIsNone(cache.lookup("0")[0])
+        self.assertEqual(cache.lookup("1")[0], "result-1")
+        self.assertEqual(cache.lookup("2")[0], "result-2")
+
+    def test_concurrent_adds_keep_results_aligned(self):
+        """测试多线程并发写入（含淘汰）时每一行向量仍对应自己的结果"""
+        cache = self._cache(max_size=50, dim=200)
+
+        def add(i):
+            _, query = cache.lookup(str(i))
+            cache.add(query, i)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(add, range(200)))
+
+        self.assertEqual(len(cache._responses), 50)
+        self.assertEqual(cache._embeddings.shape[0], 50)
+        for row, value in zip(cache._embeddings, cache._responses):
+            self.assertEqual(int(row.argmax()), value)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
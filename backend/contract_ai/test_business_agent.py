@@ -0,0 +1,37 @@
+import copy
+import unittest
+from unittest.mock import MagicMock
+from contract_ai.business_agent import ContractReviewAgent
+
+CONTRACT_TEXT = """甲方：北京某某科技有限公司
+乙方：上海某某贸易有限公司
+甲方应于验收合格后30日内付款。
+乙方逾期交付的，应按日支付违约金。
+争议由甲方所在地人民法院管辖。
+"""
+
+class TestContractReviewAgent(unittest.TestCase):
+    """ContractReviewAgent类的单元测试用例"""
+
+    def setUp(self):
+        self.agent = ContractReviewAgent()
+        self.agent.get_llm_contract_analysis = MagicMock(return_value="LLM详细分析")
+
+    def test_cached_analysis_is_isolated_between_requests(self):
+        """测试修改返回的分析字典不会影响同一合同后续请求的结果"""
+        first = self.agent.process_text_message(CONTRACT_TEXT)
+        expected = copy.deepcopy(first["analysis"])
+
+        # 首次生成的结果与缓存命中返回的结果都被修改
+        second = self.agent.process_text_message(CONTRACT_TEXT)
+        for analysis in (first["analysis"], second["analysis"]):
+            analysis["party_analysis"]["parties_identified"].clear()
+            analysis["risk_analysis"]["已修改"] = True
+
+        result = self.agent.process_text_message(CONTRACT_TEXT)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["analysis"], expected)
+        self.agent.get_llm_contract_analysis.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+from contract_ai.coordinator import ContractCoordinator, WorkflowMetrics, _workflow_deadline
+from contract_ai.config import Config
+from langchain_core.messages import HumanMessage
+
+def make_agent(name, result):
+    """构造返回固定结果的mock智能体"""
+    agent = MagicMock()
+    agent._generate_cache_key.side_effect = lambda text: f"{name}:{text}"
+    agent.ainvoke = AsyncMock(return_value=result)
+    return agent
+
+class TestAgentResultCache(unittest.TestCase):
+    """协调器分析结果缓存的单元测试用例"""
+
+    def setUp(self):
+        self.coordinator = ContractCoordinator()
+        self.metrics = WorkflowMetrics()
+
+    def invoke(self, agent, text="合同文本"):
+        return asyncio.run(self.coordinator._invoke_agent_cached("legal", agent, text, self.metrics))
+
+    def test_success_result_is_cached(self):
+        """测试成功结果被缓存，再次请求不调用智能体并计入命中数"""
+        agent = make_agent("legal", {"status": "success", "analysis": {"risk": "低"}})
+
+        first = self.invoke(agent)
+        second = self.invoke(agent)
+
+        agent.ainvoke.assert_awaited_once()
+        self.assertEqual(second, first)
+        self.assertEqual(self.metrics.cache_hits, 1)
+
+    def test_error_result_is_not_cached(self):
+        """测试出错的结果不缓存，下次重新调用智能体"""
+        agent = make_agent("legal", {"status": "error", "message": "失败"})
+
+        self.invoke(agent)
+        self.invoke(agent)
+
+        self.assertEqual(agent.ainvoke.await_count, 2)
+        self.assertEqual(self.metrics.cache_hits, 0)
+
+    def test_cached_result_is_isolated_between_requests(self):
+        """测试修改返回的结果不会影响缓存中的条目"""
+        agent = make_agent("legal", {"status": "success", "analysis": {"risk": "低"}})
+
+        self.invoke(agent)["analysis"]["risk"] = "已修改"
+        self.invoke(agent)["analysis"]["risk"] = "再次修改"
+
+        self.assertEqual(self.invoke(agent)["analysis"]["risk"], "低")
+
+    def test_deadline_exceeded_skips_agent(self):
+        """测试超过审查总时限后不再调用智能体"""
+        agent = make_agent("legal", {"status": "success"})
+
+        async def run():
+            token = _workflow_deadline.set(time.monotonic() - 1)
+            try:
+                return await self.coordinator._invoke_agent_cached("legal", agent, "合同文本", self.metrics)
+            finally:
+                _workflow_deadline.reset(token)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(run())
+        agent.ainvoke.assert_not_awaited()
+
+    def test_document_result_is_cached(self):
+        """测试同一文档重复审查时复用文档解析结果"""
+        agent = make_agent("document", {"status": "success", "summary": "摘要"})
+
+        async def get_agent(name):
+            return agent
+
+        with patch.object(self.coordinator, "_get_agent", side_effect=get_agent):
+            for _ in range(2):
+                state = {"user_input": "招标文件", "metrics": WorkflowMetrics()}
+                state = asyncio.run(self.coordinator.run_document_agent_optimized(state))
+
+        agent.ainvoke.assert_awaited_once()
+        self.assertEqual(state["document_summary"], {"summary": "摘要"})
+        self.assertEqual(state["metrics"].cache_hits, 1)
+
+class TestAgentConcurrencyLimit(unittest.TestCase):
+    """分析智能体并发上限的单元测试用例"""
+
+    def setUp(self):
+        self.coordinator = ContractCoordinator()
+        self.coordinator.cache = None
+
+    def test_limit_shared_across_event_loops(self):
+        """测试同一协调器可在多个事件循环中使用，且同时运行的调用数不超过上限"""
+        running = 0
+        peak = 0
+
+        async def slow_invoke(payload):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"status": "success", "text": payload["text"]}
+
+        agent = MagicMock()
+        agent.ainvoke = slow_invoke
+        limit = Config.PERFORMANCE_CONFIG.max_workers
+
+        async def burst():
+            return await asyncio.gather(*(
+                self.coordinator._invoke_agent_cached("legal", agent, f"合同{i}", WorkflowMetrics())
+                for i in range(limit * 2)
+            ))
+
+        for _ in range(2):
+            results = asyncio.run(burst())
+            self.assertEqual([r["text"] for r in results], [f"合同{i}" for i in range(limit * 2)])
+        self.assertEqual(peak, limit)
+
+    def test_timed_out_call_keeps_slot_until_finished(self):
+        """测试超时后名额保留到智能体调用真正结束"""
+        async def run():
+            done = asyncio.Event()
+
+            async def slow_invoke(payload):
+                await done.wait()
+                return {"status": "success"}
+
+            agent = MagicMock()
+            agent.ainvoke = slow_invoke
+            token = _workflow_deadline.set(time.monotonic() + 0.05)
+            try:
+                with self.assertRaises(TimeoutError):
+                    await self.coordinator._invoke_agent_cached("legal", agent, "合同文本", WorkflowMetrics())
+            finally:
+                _workflow_deadline.reset(token)
+
+            available = self.coordinator._agent_limiter._available
+            done.set()
+            await asyncio.sleep(0.01)
+            return available, self.coordinator._agent_limiter._available
+
+        before, after = asyncio.run(run())
+        self.assertEqual(after, before + 1)
+
+class TestWorkflowStream(unittest.TestCase):
+    """流式工作流的单元测试用例"""
+
+    def test_stream_yields_one_event_per_stage(self):
+        """测试每个节点完成后产出该阶段的结果，不推送完整的解析结果"""
+        coordinator = ContractCoordinator()
+        agents = {
+            "document": make_agent("document", {"status": "success", "summary": "文档摘要"}),
+            "legal": make_agent("legal", {"status": "success", "analysis": "法律分析"}),
+            "business": make_agent("business", {"status": "success", "analysis": "商务分析"}),
+            "integration": make_agent("integration", {"status": "success", "report": "综合报告"}),
+        }
+
+        async def get_agent(name):
+            return agents[name]
+
+        async def collect():
+            return [event async for event in coordinator.astream_text_message(HumanMessage(content="招标文件"))]
+
+        with patch.object(coordinator, "_get_agent", side_effect=get_agent):
+            events = asyncio.run(collect())
+
+        self.assertEqual([event["node"] for event in events], ["document", "parallel", "integrate"])
+        self.assertEqual(events[0]["document_summary"], {"summary": "文档摘要"})
+        self.assertEqual(events[1]["legal_summary"], {"analysis": "法律分析"})
+        self.assertIn("综合报告", events[2]["final_response"])
+        for event in events:
+            self.assertIsNone(event["error"])
+            self.assertNotIn("document_result", event)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+from contract_ai.integration_agent import IntegrationAgent
+
+# 风险数足够多，单次整合耗时超过线程切换间隔，并发请求的处理会相互交错
+RISKS_PER_REQUEST = 2000
+
+def make_results(tag):
+    """构造只含一个请求自身高风险项的分析结果"""
+    return {
+        'legal': {
+            'analysis': {
+                'risk_assessment': {
+                    'high_risk': [
+                        {'category': f'合规风险{tag}', 'description': f'请求{tag}的风险{i}'}
+                        for i in range(RISKS_PER_REQUEST)
+                    ]
+                }
+            }
+        }
+    }
+
+class TestIntegrationAgent(unittest.TestCase):
+    """IntegrationAgent类的单元测试用例"""
+
+    def setUp(self):
+        self.agent = IntegrationAgent()
+
+    def test_integrate_results_counts_risks(self):
+        """测试整合结果包含所有高风险项"""
+        report = self.agent.integrate_results(make_results("A"))
+
+        self.assertEqual(report["metadata"]["total_risks"], RISKS_PER_REQUEST)
+        self.assertEqual(report["risk_assessment"]["risk_distribution"]["high"], RISKS_PER_REQUEST)
+
+    def test_concurrent_reviews_keep_their_own_risks(self):
+        """测试并发整合时每份报告只包含自身请求的风险"""
+        tags = ["A", "B", "C", "D"]
+
+        async def run():
+            return await asyncio.gather(*(
+                self.agent.ainvoke({"results": make_results(tag)}) for tag in tags
+            ))
+
+        for _ in range(5):
+            reports = asyncio.run(run())
+            for tag, report in zip(tags, reports):
+                self.assertEqual(report["metadata"]["total_risks"], RISKS_PER_REQUEST)
+                for item in report["risk_assessment"]["high_risk_items"]:
+                    self.assertTrue(item["description"].startswith(f"请求{tag}"))
+
+if __name__ == "__main__":
+    unittest.main()